@@ -0,0 +1 @@
+"""Benchmarks for Yark's archive core, run them from the repository root using `python -m benchmarks.[name]`"""
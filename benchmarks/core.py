@@ -0,0 +1,169 @@
+"""Times the core archive paths like loading, parsing metadata and committing on synthetic archives, without the network"""
+
+from contextlib import contextmanager, redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from yark import Channel, DownloadConfig
+from yark.channel import ARCHIVE_COMPAT, _migrate_archive
+import copy
+import json
+import platform
+import sys
+import threading
+import time
+from . import synthetic
+
+
+class _ThumbnailHandler(BaseHTTPRequestHandler):
+    """Serves synthetic thumbnails for any `/vi/<id>/...` path, supporting etags like YouTube does"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        id = self.path.split("/")[2]
+        etag = f'"{id}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        image = synthetic.thumbnail(id)
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "image/webp")
+        self.send_header("Content-Length", str(len(image)))
+        self.end_headers()
+        self.wfile.write(image)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def _thumbnail_server():
+    """Runs a local thumbnail server for the duration of the context, giving it's base url"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ThumbnailHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _time(results: list[dict], case: str, videos: int, history: int, run):
+    """Times `run` with it's output hidden, adding the result and returning what it returned"""
+    with redirect_stdout(StringIO()):
+        start = time.perf_counter()
+        result = run()
+        took = time.perf_counter() - start
+    results.append(
+        {
+            "benchmark": "core",
+            "case": case,
+            "videos": videos,
+            "history": history,
+            "seconds": round(took, 4),
+            "python": platform.python_version(),
+        }
+    )
+    return result
+
+
+def run(videos: int, history: int) -> list[dict]:
+    """Runs every core benchmark for an archive of `videos` videos with `history` refreshes each"""
+    results: list[dict] = []
+    with TemporaryDirectory() as temp, _thumbnail_server() as thumbnails:
+        # Generate archive, an empty one to add everything to and metadata for both
+        path = Path(temp) / "bench"
+        empty_path = Path(temp) / "empty"
+        plain = synthetic.plain(videos, history)
+        synthetic.save(synthetic.encode(plain), path)
+        synthetic.save(synthetic.archive(0), empty_path)
+        res = synthetic.metadata(plain, thumbnails)
+        old = plain
+        old["version"] = 1
+        old["id"] = old.pop("url").split("/")[-1]
+        del old["livestreams"], old["shorts"]
+        for video in old["videos"]:
+            del video["deleted"], video["changes"]
+
+        # Loading
+        channel = _time(results, "load", videos, history, lambda: Channel.load(path))
+        _time(
+            results,
+            "load_lazy",
+            videos,
+            history,
+            lambda: Channel.load(path, lazy=True),
+        )
+
+        # Parsing metadata where every video is new, copying it first as parsing changes it
+        new_res, update_res = copy.deepcopy(res), copy.deepcopy(res)
+        empty = _time(
+            results, "load_empty", videos, history, lambda: Channel.load(empty_path)
+        )
+        _time(
+            results,
+            "parse_metadata_new",
+            videos,
+            history,
+            lambda: empty._parse_metadata(new_res),
+        )
+        del empty
+
+        # Parsing metadata where every video is already known
+        _time(
+            results,
+            "parse_metadata_update",
+            videos,
+            history,
+            lambda: channel._parse_metadata(update_res),
+        )
+
+        # Committing the updated archive
+        _time(results, "commit", videos, history, channel.commit)
+
+        # Curating videos to download
+        _time(
+            results,
+            "curate",
+            videos,
+            history,
+            lambda: channel._curate(DownloadConfig()),
+        )
+
+        # Reporting
+        _time(
+            results,
+            "interesting_changes",
+            videos,
+            history,
+            channel.reporter.interesting_changes,
+        )
+
+        # Migrating from the first archive version
+        _time(
+            results,
+            "migrate_archive",
+            videos,
+            history,
+            lambda: _migrate_archive(1, ARCHIVE_COMPAT, old, "bench"),
+        )
+
+    # Return
+    return results
+
+
+if __name__ == "__main__":
+    # Sizes to run at, given as arguments or defaulting to 1k, 10k and 100k videos
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    for videos in sizes:
+        for result in run(videos, 30):
+            print(json.dumps(result))
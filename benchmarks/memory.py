@@ -0,0 +1,142 @@
+"""Measures memory used by a loaded archive compared to the dictionary-based models Yark used to have, and what pooling it's strings saves"""
+
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from yark import Channel
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+from . import synthetic
+
+
+class _DictVideo:
+    """Video like it used to be, with a per-instance `__dict__` and elements which are `dict[datetime, Any]`"""
+
+    def __init__(self, encoded: dict) -> None:
+        self.id = encoded["id"]
+        self.uploaded = datetime.fromisoformat(encoded["uploaded"])
+        self.width = encoded["width"]
+        self.height = encoded["height"]
+        for name in ["title", "description", "views", "likes", "deleted"]:
+            setattr(self, name, _DictElement(encoded[name]))
+        self.thumbnail = _DictElement(encoded["thumbnail"])
+        self.notes = []
+        self.known_not_deleted = False
+
+
+class _DictElement:
+    """Element like it used to be, a `dict[datetime, Any]`"""
+
+    def __init__(self, encoded: dict) -> None:
+        self.inner = {datetime.fromisoformat(key): encoded[key] for key in encoded}
+
+
+def measure(load) -> int:
+    """Measures bytes still allocated by the result of calling `load`"""
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def run(videos: int, history: int) -> dict:
+    """Runs memory benchmark for an archive of `videos` videos with `history` refreshes each"""
+    with TemporaryDirectory() as temp:
+        path = Path(temp) / "bench"
+        plain = synthetic.plain(videos, history)
+        synthetic.save(synthetic.encode(plain), path)
+        with open(Path(temp) / "plain.json", "w+") as file:
+            json.dump(plain, file)
+        del plain
+
+        def load_dicts():
+            encoded = json.load(open(Path(temp) / "plain.json", "r"))
+            return [_DictVideo(video) for video in encoded["videos"]]
+
+        dicts = measure(load_dicts)
+        with redirect_stdout(StringIO()):
+            models = measure(lambda: Channel.load(path))
+            unshared = measure(lambda: _unshare(Channel.load(path)))
+        return {
+            "benchmark": "memory",
+            "videos": videos,
+            "history": history,
+            "dict_bytes": dicts,
+            "model_bytes": models,
+            "reduction": round(1 - models / dicts, 3),
+            "unshared_bytes": unshared,
+            "shared_reduction": round(1 - models / unshared, 3),
+            "rss_bytes": _rss(path, False),
+            "unshared_rss_bytes": _rss(path, True),
+        }
+
+
+def _unshare(channel: Channel) -> Channel:
+    """Gives every title and description it's own copy of it's strings, like before they were pooled"""
+    for videos in [channel.videos, channel.livestreams, channel.shorts]:
+        for video in videos:
+            for text in [video.title, video.description]:
+                text._values = [_copy(value) for value in text._values]
+                text._current = text._rebuild(len(text._values) - 1)
+    return channel
+
+
+def _copy(value):
+    """Copies every string in a full text or diff from a text's history"""
+    if isinstance(value, str):
+        return value.encode().decode()
+    elif isinstance(value, list):
+        return [op if isinstance(op, list) else op.encode().decode() for op in value]
+    return value
+
+
+def _rss(path: Path, unshared: bool) -> int:
+    """Measures resident memory of a fresh process after it's loaded the archive at `path`"""
+    args = [sys.executable, "-m", "benchmarks.memory", "--rss", str(path)]
+    return int(
+        subprocess.run(
+            args + (["--unshared"] if unshared else []),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()[-1]
+    )
+
+
+def _print_rss(path: Path, unshared: bool):
+    """Loads archive and prints resident memory of this process, which is run by `_rss`"""
+    with redirect_stdout(StringIO()):
+        channel = Channel.load(path)
+        if unshared:
+            _unshare(channel)
+    gc.collect()
+    try:
+        with open("/proc/self/statm", "r") as file:
+            print(int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"))
+    except FileNotFoundError:
+        # Peak instead of current on systems without procfs, which is in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(peak if sys.platform == "darwin" else peak * 1024)
+
+
+if __name__ == "__main__":
+    # Measure resident memory as a child of `_rss`
+    if len(sys.argv) > 2 and sys.argv[1] == "--rss":
+        _print_rss(Path(sys.argv[2]), "--unshared" in sys.argv)
+        sys.exit(0)
+
+    # Sizes to run at, given as arguments or defaulting to 1k and 10k videos
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000]
+    for videos in sizes:
+        print(json.dumps(run(videos, 365)))
@@ -0,0 +1,151 @@
+"""Generator for synthetic archives shaped like real-world ones, so benchmarks don't need the network"""
+
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from io import StringIO
+from pathlib import Path
+import copy
+import hashlib
+import json
+import random
+from yark.channel import ARCHIVE_COMPAT, _migrate_archive
+
+WORDS = "the a how why best worst new old video guide review update live stream reaction music game build test day week year first last ultimate quick easy hard".split()
+"""Words synthetic titles and descriptions are made from"""
+
+TEMPLATES = [
+    "Thanks for watching! Subscribe for more.\n\nFollow me:\nTwitter: https://twitter.com/example\nInstagram: https://instagram.com/example\n\nMusic by Example Artist\n#shorts #video",
+    "Support the channel on Patreon: https://patreon.com/example\n\nGear I use:\nCamera: https://example.com/camera\nMic: https://example.com/mic\n\nBusiness enquiries: hello@example.com",
+    "Chapters:\n00:00 Intro\n01:30 Main part\n10:00 Outro\n\nJoin the Discord: https://discord.gg/example",
+]
+"""Description footers which creators paste into every upload"""
+
+START = datetime(2020, 1, 1)
+"""Date the synthetic channel started uploading"""
+
+
+def archive(videos: int, history: int = 30, seed: int = 0) -> dict:
+    """Generates an encoded archive with `videos` videos, each with `history` refreshes of view and like history"""
+    return encode(plain(videos, history, seed))
+
+
+def plain(videos: int, history: int = 30, seed: int = 0) -> dict:
+    """Generates a v4 archive, which has every version of titles and descriptions written out in full like yark used to store them"""
+    rand = random.Random(seed)
+    return {
+        "version": 4,
+        "url": "https://www.youtube.com/channel/UCSMdm6bUYIBN0KfS2CVuEPA",
+        "videos": [_video(rand, ind, videos, history) for ind in range(videos)],
+        "livestreams": [],
+        "shorts": [],
+    }
+
+
+def encode(plain: dict) -> dict:
+    """Encodes a plain archive in the current format using yark's own migrations"""
+    with redirect_stdout(StringIO()):
+        return _migrate_archive(4, ARCHIVE_COMPAT, copy.deepcopy(plain), "synthetic")
+
+
+def save(encoded: dict, path: Path):
+    """Saves an encoded archive to `path` with the directories a real archive has"""
+    for directory in [path, path / "thumbnails", path / "videos"]:
+        directory.mkdir(exist_ok=True)
+    with open(path / "yark.json", "w+") as file:
+        json.dump(encoded, file)
+
+
+def metadata(plain: dict, thumbnails: str, seed: int = 0) -> dict:
+    """Generates yt-dlp metadata for every video in a plain archive as if it was refreshed, with thumbnails served from the `thumbnails` base url"""
+    rand = random.Random(seed)
+    entries = []
+    for video in plain["videos"]:
+        # Counts grow a little since the last refresh
+        views = list(video["views"].values())[-1]
+        likes = list(video["likes"].values())[-1]
+        entries.append(
+            {
+                "id": video["id"],
+                "upload_date": datetime.fromisoformat(video["uploaded"]).strftime(
+                    "%Y%m%d"
+                ),
+                "width": video["width"],
+                "height": video["height"],
+                "title": list(video["title"].values())[-1],
+                "description": list(video["description"].values())[-1],
+                "view_count": views + rand.randrange(0, 5000),
+                "like_count": (
+                    likes + rand.randrange(0, 50) if likes is not None else None
+                ),
+                "thumbnail": f"{thumbnails}/vi/{video['id']}/maxresdefault.webp",
+                "formats": [{"format_id": "18"}],
+            }
+        )
+    return {"entries": entries}
+
+
+def thumbnail(id: str) -> bytes:
+    """Generates the thumbnail image served for a video, which is small but unique to it"""
+    return b"RIFF\x00\x00\x00\x00WEBPVP8 " + id.encode()
+
+
+def _video(rand: random.Random, ind: int, videos: int, history: int) -> dict:
+    """Generates an encoded video, newest first so the archive is sorted like real ones"""
+    uploaded = START + timedelta(hours=(videos - ind) * 12)
+    refreshes = [
+        uploaded + timedelta(days=day, microseconds=rand.randrange(1000000))
+        for day in range(history)
+    ]
+
+    # Views and likes grow most refreshes
+    views, likes = rand.randrange(100, 10000), rand.randrange(10, 1000)
+    views_history, likes_history = {}, {}
+    for date in refreshes:
+        views_history[date.isoformat()] = views
+        likes_history[date.isoformat()] = likes if rand.random() > 0.05 else None
+        views += rand.randrange(0, 5000)
+        likes += rand.randrange(0, 50)
+
+    # Titles occasionally change, some descriptions are only the creator's template and footers get edited across lots of videos at once
+    title = {refreshes[0].isoformat(): _sentence(rand, 6)}
+    intro = _sentence(rand, 20) + "\n\n" if rand.random() > 0.25 else ""
+    template = rand.choice(TEMPLATES)
+    description = {refreshes[0].isoformat(): intro + template}
+    if rand.random() < 0.1:
+        title[refreshes[-1].isoformat()] = _sentence(rand, 6)
+    if rand.random() < 0.3:
+        description[refreshes[-1].isoformat()] = (
+            intro + template + "\n\nNew merch out now!"
+        )
+
+    # Return
+    return {
+        "id": f"{ind:011d}",
+        "uploaded": uploaded.isoformat(),
+        "width": 1920,
+        "height": 1080,
+        "title": title,
+        "description": description,
+        "views": views_history,
+        "likes": likes_history,
+        "thumbnail": {refreshes[0].isoformat(): _thumbnail_id(f"{ind:011d}")},
+        "deleted": {refreshes[0].isoformat(): False},
+        "notes": [],
+        "changes": {
+            "title": sorted(title)[1:],
+            "description": sorted(description)[1:],
+            "deleted": [],
+        },
+    }
+
+
+def _thumbnail_id(id: str) -> str:
+    """Gets id yark gives to the thumbnail of a video once it's been fetched"""
+    return hashlib.blake2b(
+        thumbnail(id), digest_size=20, usedforsecurity=False
+    ).hexdigest()
+
+
+def _sentence(rand: random.Random, words: int) -> str:
+    """Generates a random sentence"""
+    return " ".join(rand.choice(WORDS) for _ in range(words)).capitalize()
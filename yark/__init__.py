@@ -11,9 +11,13 @@ Commonly-used
     - `DownloadConfig`
 - `Video`
     - `Element`
+        - `Counter`
+        - `Text`
     - `Note`
     - `Thumbnail`
+- `SearchIndex`
 - `viewer()`
+- `refresh_all()`
 - `ArchiveNotFoundException`
 - `VideoNotFoundException`
 - `NoteNotFoundException`
@@ -23,8 +27,10 @@ Beware that using Yark as a library is currently experimental and breaking chang
 """
 
 from .channel import Channel, DownloadConfig
-from .video import Video, Element, Note, Thumbnail
+from .video import Video, Element, Counter, Text, Note, Thumbnail
 from .viewer import viewer
+from .batch import refresh_all
+from .search import SearchIndex
 from .errors import (
     ArchiveNotFoundException,
     VideoNotFoundException,
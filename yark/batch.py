@@ -0,0 +1,195 @@
+"""Refreshing of many archives at once using a pool of processes"""
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+from multiprocessing import Manager
+from pathlib import Path
+from typing import Optional
+import os
+import time
+from colorama import Fore, Style
+from .channel import Channel, DownloadConfig
+from .errors import ArchiveNotFoundException
+
+
+class BatchResult:
+    """Outcome of refreshing one archive in a batch, including everything it printed"""
+
+    path: Path
+    ok: bool
+    error: Optional[str]
+    output: str
+    added: int
+    deleted: int
+    updated: int
+    took: float
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.ok = False
+        self.error = None
+        self.output = ""
+        self.added = 0
+        self.deleted = 0
+        self.updated = 0
+        self.took = 0.0
+
+
+def discover(root: Path) -> list[Path]:
+    """Finds archives under `root`, not looking inside of archives themselves"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        if "yark.json" in filenames or "yark.sqlite" in filenames:
+            found.append(Path(dirpath))
+            dirnames.clear()
+        else:
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+    return sorted(found)
+
+
+def shared_paths(config: DownloadConfig) -> list[str]:
+    """Finds arguments in `config` which would have every archive write to the same file instead of one each"""
+    shared = []
+    if config.report is not None and not config.report.is_dir():
+        shared.append("--report")
+    if config.prometheus is not None and not config.prometheus.is_dir():
+        shared.append("--prometheus")
+    if isinstance(config.record, Path):
+        shared.append("--record")
+    return shared
+
+
+def refresh_all(
+    root: Path, config: DownloadConfig, metadata_jobs: int = 4, download_jobs: int = 2
+) -> list[BatchResult]:
+    """Refreshes every archive under `root` in parallel, printing each archive's output once it's done and then a combined report"""
+    # Find archives
+    archives = discover(root)
+    if len(archives) == 0:
+        raise ArchiveNotFoundException(f"No archives found under {root}")
+    print(f"Refreshing {len(archives)} archives under {root}..")
+
+    # Refresh them with separate limits on how many can be in each phase at once
+    results = []
+    processes = min(max(metadata_jobs, download_jobs), len(archives))
+    with Manager() as manager, ProcessPoolExecutor(processes) as ex:
+        metadata_sem = manager.Semaphore(metadata_jobs)
+        download_sem = manager.Semaphore(download_jobs)
+        futures = [
+            ex.submit(
+                _refresh_one,
+                path,
+                path.relative_to(root).as_posix(),
+                config,
+                metadata_sem,
+                download_sem,
+            )
+            for path in archives
+        ]
+
+        # Print each archive's output as one block as they finish
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            _print_result(result, len(results), len(archives))
+
+    # Combined report in discovery order
+    results.sort(key=lambda result: result.path)
+    _print_summary(results)
+    return results
+
+
+def _refresh_one(
+    path: Path, name: str, config: DownloadConfig, metadata_sem, download_sem
+):
+    """Refreshes a single archive inside of a worker process, capturing all of it's output and naming shared outputs after it's `name` relative to the root"""
+    result = BatchResult(path)
+    output = StringIO()
+    start = time.monotonic()
+    with redirect_stdout(output), redirect_stderr(output):
+        try:
+            # Refresh like a normal `yark refresh`
+            channel = Channel.load(path)
+            if config.skip_metadata:
+                print("Skipping metadata download..")
+            else:
+                with metadata_sem:
+                    channel.metadata(config)
+            if config.skip_download:
+                print("Skipping videos/livestreams/shorts download..")
+            else:
+                with download_sem:
+                    channel.download(config)
+            channel.commit()
+            channel.metrics.emit(name, config.metrics, config.prometheus)
+            channel.reporter.print()
+            if config.report is not None:
+                channel.reporter.export(config.report, name)
+
+            # Remember what changed
+            result.ok = True
+            result.added = len(channel.reporter.added)
+            result.deleted = len(channel.reporter.deleted)
+            result.updated = len(channel.reporter.updated)
+
+        # Errors which normally exit the cli only fail this archive
+        except SystemExit as e:
+            result.error = f"exited with code {e.code}"
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+
+    # Return
+    result.output = output.getvalue()
+    result.took = time.monotonic() - start
+    return result
+
+
+def _print_result(result: BatchResult, done: int, total: int):
+    """Prints the captured output of a finished archive refresh as one block"""
+    colour = Fore.GREEN if result.ok else Fore.RED
+    print(
+        colour
+        + Style.BRIGHT
+        + f"[{done}/{total}] {result.path}"
+        + Style.NORMAL
+        + Fore.RESET
+    )
+    print(result.output.rstrip())
+    if result.error is not None:
+        print(Fore.RED + f"Failed: {result.error}" + Fore.RESET)
+    print()
+
+
+def _print_summary(results: list[BatchResult]):
+    """Prints combined report of every archive in the batch"""
+    print(Style.BRIGHT + "Combined report:" + Style.NORMAL)
+    for result in results:
+        name = f"  • {result.path}".ljust(50)
+        took = f"{result.took:.0f}s".rjust(6)
+        if result.ok:
+            print(
+                name
+                + f" │ {took} │ "
+                + Fore.GREEN
+                + f"+{result.added} "
+                + Fore.RED
+                + f"-{result.deleted} "
+                + Fore.BLUE
+                + f"~{result.updated}"
+                + Fore.RESET
+            )
+        else:
+            print(name + f" │ {took} │ " + Fore.RED + result.error + Fore.RESET)
+
+    # Totals
+    failed = sum(1 for result in results if not result.ok)
+    print(
+        Style.DIM
+        + f"  {len(results) - failed} refreshed, {failed} failed, "
+        + f"{sum(result.added for result in results)} added, "
+        + f"{sum(result.deleted for result in results)} deleted, "
+        + f"{sum(result.updated for result in results)} updated"
+        + Style.NORMAL
+    )
@@ -1,29 +1,46 @@
 """Channel and overall archive management with downloader"""
 
 from __future__ import annotations
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 from pathlib import Path
 import time
 from yt_dlp import YoutubeDL, DownloadError  # type: ignore
 from colorama import Style, Fore
+import requests
 import sys
 from .reporter import Reporter
 from .errors import ArchiveNotFoundException, _err_msg, VideoNotFoundException
-from .video import Video, Element
+from .video import Video, Note, _encode_text
+from .pool import StringPool
+from .fetcher import ThumbnailFetcher
+from .database import Database
+from .metrics import Metrics
+from .recording import record, replay
+from .search import SearchIndex
+from .utils import _stamp
+from .journal import (
+    Journal,
+    JOURNAL_COMPACT_SIZE,
+    _note_change,
+    _replay,
+)
 from typing import Any
 import time
 from progress.spinner import PieSpinner
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, wait
+from queue import Queue, Empty
 import time
 
-ARCHIVE_COMPAT = 3
+ARCHIVE_COMPAT = 5
 """
 Version of Yark archives which this script is capable of properly parsing
 
 - Version 1 was the initial format and had all the basic information you can see in the viewer now
 - Version 2 introduced livestreams and shorts into the mix, as well as making the channel id into a simple url
 - Version 3 was a minor change to introduce a deleted tag so we have full reporting capability
+- Version 4 added the dates of each video's title, description and deleted changes so reports don't need to decode every history
+- Version 5 stored title and description histories as full values every so often with diffs from the previous value in between
 
 Some of these breaking versions are large changes and some are relatively small.
 We don't check if a value exists or not in the archive format out of precedent
@@ -33,7 +50,10 @@ gets a line or two of extra code every breaking change. This is much better than
 having way more complexity in the archiver decoding system itself.
 """
 
-from typing import Optional
+from typing import Optional, Union
+
+_TAB_KINDS = {"videos": "video", "live": "livestream", "shorts": "shorts"}
+"""Categories of video for the tabs of a channel, by the end of the tab's title"""
 
 
 class DownloadConfig:
@@ -43,6 +63,17 @@ class DownloadConfig:
     skip_download: bool
     skip_metadata: bool
     format: Optional[str]
+    incremental: bool
+    refresh_recent: Optional[int]
+    refresh_stale: Optional[int]
+    refresh_ids: Optional[set[str]]
+    record: Union[bool, Path]
+    replay: Optional[Path]
+    metrics: Optional[Path]
+    prometheus: Optional[Path]
+    report: Optional[Path]
+    workers: int
+    retries: int
 
     def __init__(self) -> None:
         self.max_videos = None
@@ -51,6 +82,17 @@ class DownloadConfig:
         self.skip_download = False
         self.skip_metadata = False
         self.format = None
+        self.incremental = False
+        self.refresh_recent = 14
+        self.refresh_stale = 30
+        self.refresh_ids = None
+        self.record = False
+        self.replay = None
+        self.metrics = None
+        self.prometheus = None
+        self.report = None
+        self.workers = 4
+        self.retries = 4
 
     def submit(self):
         """Submits configuration, this has the effect of normalising maximums to 0 properly"""
@@ -122,24 +164,45 @@ class Channel:
     path: Path
     version: int
     url: str
+    backend: str
     videos: list[Video]
     livestreams: list[Video]
     shorts: list[Video]
     reporter: Reporter
+    fetcher: ThumbnailFetcher
+    journal: Journal
+    metrics: Metrics
+    search_index: SearchIndex
+    strings: Optional[StringPool]
+    stamp: Optional[tuple]
+    _files: Optional[dict[str, str]]
+    _index: dict[str, Video]
+    _buckets: dict[str, dict[str, Video]]
+    _refreshed: Optional[dict[str, str]]
 
     @staticmethod
-    def new(path: Path, url: str) -> Channel:
-        """Creates a new channel"""
+    def new(path: Path, url: str, backend: str = "json") -> Channel:
+        """Creates a new channel, stored as `yark.json` or as `yark.sqlite` if the `backend` is `sqlite`"""
         # Details
         print("Creating new channel..")
         channel = Channel()
         channel.path = Path(path)
         channel.version = ARCHIVE_COMPAT
         channel.url = url
+        channel.backend = backend
         channel.videos = []
         channel.livestreams = []
         channel.shorts = []
         channel.reporter = Reporter(channel)
+        channel.metrics = Metrics()
+        channel.fetcher = ThumbnailFetcher(channel.path, metrics=channel.metrics)
+        channel.journal = Journal(channel.path)
+        channel.search_index = SearchIndex(channel.path)
+        channel.strings = None
+        channel.stamp = None
+        channel._files = None
+        channel._refreshed = None
+        channel._reindex()
 
         # Commit and return
         channel.commit()
@@ -152,47 +215,85 @@ class Channel:
         )
 
     @staticmethod
-    def load(path: Path) -> Channel:
-        """Loads existing channel from path"""
+    def load(path: Path, lazy: bool = False) -> Channel:
+        """Loads existing channel from path, only decoding each video's history when it's first used if `lazy`"""
         # Check existence
         path = Path(path)
         channel_name = path.name
         print(f"Loading {channel_name} channel..")
         if not path.exists():
             raise ArchiveNotFoundException("Archive doesn't exist")
-
-        # Load config
-        encoded = json.load(open(path / "yark.json", "r"))
+        start = time.perf_counter()
+        stamp = _stamp(path)
+
+        # Load config from whichever format it's stored in, leaving databases open for lazy channels to read each video's rows from
+        if Database.exists(path):
+            backend = "sqlite"
+            database = Database(path)
+            if lazy:
+                encoded = database.read(lazy=True)
+
+            # Migrations change whole histories so they need everything read
+            if not lazy or encoded["version"] != ARCHIVE_COMPAT:
+                encoded = database.read()
+                database.close()
+        else:
+            backend = "json"
+            encoded = json.load(open(path / "yark.json", "r"))
 
         # Check version before fully decoding and exit if wrong
         archive_version = encoded["version"]
         if archive_version != ARCHIVE_COMPAT:
             encoded = _migrate_archive(
-                archive_version, ARCHIVE_COMPAT, encoded, channel_name
+                archive_version,
+                ARCHIVE_COMPAT,
+                encoded,
+                channel_name,
+                "yark.sqlite.bak" if backend == "sqlite" else "yark.bak",
             )
 
-        # Decode and return
-        return Channel._from_dict(encoded, path)
+        # Decode and replay changes made since the last commit
+        channel = Channel._from_dict(encoded, path, lazy)
+        channel.backend = backend
+        channel.stamp = stamp
+        for change in channel.journal.changes():
+            _replay(channel, change)
+        channel.metrics.record("load", start, len(channel._index))
+
+        # Return
+        return channel
+
+    def metadata(self, config: Optional[DownloadConfig] = None):
+        """Queries YouTube for all channel metadata to refresh known videos, or only some of them if `config` says to be incremental"""
+        # Forget thumbnails fetched by the last refresh so they're checked again
+        self.fetcher.reset()
+
+        # Replay recorded metadata instead of downloading it, reusing it's thumbnails so nothing is fetched
+        if config is not None and config.replay is not None:
+            print(f"Replaying metadata from {config.replay}..")
+            res, thumbnails = replay(config.replay)
+            self.fetcher.fetched.update(thumbnails)
+            self._parse_metadata(res)
+            return
 
-    def metadata(self):
-        """Queries YouTube for all channel metadata to refresh known videos"""
         # Print loading progress at the start without loading indicator so theres always a print
-        msg = "Downloading metadata.."
+        incremental = config is not None and config.incremental
+        msg = "Downloading metadata.." if not incremental else "Listing videos.."
         print(msg, end="\r")
 
         # Download metadata and give the user a spinner bar
-        with ThreadPoolExecutor() as ex:
+        with self.metrics.span("download_metadata"), ThreadPoolExecutor() as ex:
             # Make future for downloading metadata
-            future = ex.submit(self._download_metadata)
+            future = (
+                ex.submit(self._download_metadata)
+                if not incremental
+                else ex.submit(self._download_metadata_incremental, config)
+            )
 
-            # Start spinning
-            with PieSpinner(f"{msg} ") as bar:
-                # Don't show bar for 2 seconds but check if future is done
-                no_bar_time = time.time() + 2
-                while time.time() < no_bar_time:
-                    if future.done():
-                        break
-                    time.sleep(0.25)
+            # Start spinning on whatever stderr is now, so batch workers capture it
+            with PieSpinner(f"{msg} ", file=sys.stderr) as bar:
+                # Don't show bar for 2 seconds but stop waiting as soon as future is done
+                wait([future], timeout=2)
 
                 # Show loading spinner
                 while not future.done():
@@ -202,46 +303,113 @@ class Channel:
             # Get result from thread now that it's finished
             res = future.result()
 
-        # Uncomment for saving big dumps for testing
-        # with open(self.path / "dump.json", "w+") as file:
-        #     json.dump(res, file)
-
-        # Uncomment for loading big dumps for testing
-        # res = json.load(open(self.path / "dump.json", "r"))
-
         # Parse downloaded metadata
         self._parse_metadata(res)
 
+        # Record metadata and the thumbnails it had so this refresh can be replayed offline
+        if config is not None and config.record:
+            path = (
+                config.record
+                if config.record is not True
+                else self.path
+                / "recordings"
+                / f"{datetime.utcnow().strftime('%Y-%m-%dT%H-%M-%S')}.json.gz"
+            )
+            record(res, self.url, self.fetcher.fetched, path)
+            print(f"Recorded metadata to {path}")
+
     def _download_metadata(self) -> dict[str, Any]:
         """Downloads metadata dict and returns for further parsing"""
-        # Construct downloader
-        settings = {
-            # Centralized logging system; makes output fully quiet
-            "logger": VideoLogger(),
-            # Skip downloading pending livestreams (#60 <https://github.com/Owez/yark/issues/60>)
-            "ignore_no_formats_error": True,
-            # Concurrent fragment downloading for increased resilience (#109 <https://github.com/Owez/yark/issues/109>)
-            "concurrent_fragment_downloads": 8,
-        }
-
         # Get response and snip it
-        with YoutubeDL(settings) as ydl:
-            for i in range(3):
-                try:
-                    res: dict[str, Any] = ydl.extract_info(self.url, download=False)
-                    return res
-                except Exception as exception:
-                    # Report error
-                    retrying = i != 2
-                    _err_dl("metadata", exception, retrying)
-
-                    # Print retrying message
-                    if retrying:
+        with YoutubeDL(_metadata_settings()) as ydl:
+            self.metrics.add("metadata_requests")
+            return _extract_info(ydl, self.url)
+
+    def _download_metadata_incremental(self, config: DownloadConfig) -> dict[str, Any]:
+        """Downloads a flat listing of videos and then full metadata for only those which are new or due a refresh, returning it in the same shape as a full download"""
+        # Construct downloaders, one for cheap listings and one for full metadata
+        settings = _metadata_settings()
+        flat_settings = {**settings, "extract_flat": "in_playlist"}
+
+        with YoutubeDL(flat_settings) as ydl_flat, YoutubeDL(settings) as ydl:
+            # Get flat listing of the channel, listing each of it's tabs if it has them
+            self.metrics.add("metadata_requests")
+            res = _extract_info(ydl_flat, self.url)
+            tabs = [
+                entry
+                for entry in res["entries"]
+                if entry.get("ie_key") == "YoutubeTab" and "url" in entry
+            ]
+            if len(tabs) != 0:
+                res["entries"] = []
+                for tab in tabs:
+                    self.metrics.add("metadata_requests")
+                    listing = _extract_info(ydl_flat, tab["url"])
+                    res["entries"].append(
+                        {"title": listing["title"], "entries": listing["entries"]}
+                    )
+                categories = [
+                    (
+                        _TAB_KINDS.get(tab["title"].split(" - ")[-1].lower()),
+                        tab["entries"],
+                    )
+                    for tab in res["entries"]
+                ]
+            else:
+                categories = [("video", res["entries"])]
+
+            # Swap listed videos for their full metadata if they're new to their category or due a refresh
+            for kind, entries in categories:
+                index = self._buckets.get(kind, {})
+                for ind, entry in enumerate(entries):
+                    video = index.get(entry["id"])
+                    if video is not None and not self._due(video, config):
+                        continue
+                    try:
+                        self.metrics.add("metadata_requests")
+                        url = f"https://www.youtube.com/watch?v={entry['id']}"
+                        entries[ind] = ydl.extract_info(url, download=False)
+                    except Exception:
                         print(
                             Style.DIM
-                            + f"  • Retrying metadata download.."
-                            + Style.RESET_ALL
-                        )  # TODO: compat with loading bar
+                            + f"  • Couldn't get metadata for {entry['id']}, skipping"
+                            + Style.NORMAL
+                        )
+
+        # Return
+        return res
+
+    def _due(self, video: Video, config: DownloadConfig) -> bool:
+        """Checks if an existing video is due a full metadata refresh during an incremental refresh"""
+        now = datetime.utcnow()
+
+        # Specific videos were asked for, like by the daemon's schedule
+        if config.refresh_ids is not None:
+            return video.id in config.refresh_ids
+
+        # Recently uploaded
+        if config.refresh_recent is not None and now - video.uploaded < timedelta(
+            days=config.refresh_recent
+        ):
+            return True
+
+        # Not refreshed in a while
+        if config.refresh_stale is not None:
+            refreshed = self.refreshed().get(video.id)
+            if refreshed is None or now - datetime.fromisoformat(
+                refreshed
+            ) >= timedelta(days=config.refresh_stale):
+                return True
+
+        # Not due
+        return False
+
+    def refreshed(self) -> dict[str, str]:
+        """Returns when each video last had it's full metadata refreshed, loading it from the archive on first use"""
+        if self._refreshed is None:
+            file = self.path / "yark.refreshed.json"
+            self._refreshed = json.load(open(file, "r")) if file.exists() else {}
+        return self._refreshed
 
     def _parse_metadata(self, res: dict[str, Any]):
         """Parses entirety of downloaded metadata"""
@@ -265,119 +433,157 @@ class Channel:
                 else:
                     _err_msg(f"Unknown video kind '{kind}' found", True)
 
+        # Fetch every thumbnail up-front over the shared pool
+        urls = [
+            entry["thumbnail"]
+            for entry in videos + livestreams + shorts
+            if "formats" in entry and len(entry["formats"]) != 0
+        ]
+        with self.metrics.span("thumbnails", len(urls)):
+            self.fetcher.prefetch(urls)
+
         # Parse metadata
-        self._parse_metadata_videos("video", videos, self.videos)
-        self._parse_metadata_videos("livestream", livestreams, self.livestreams)
-        self._parse_metadata_videos("shorts", shorts, self.shorts)
+        entries = len(videos) + len(livestreams) + len(shorts)
+        with self.metrics.span("parse_metadata", entries):
+            self._parse_metadata_videos("video", videos, self.videos)
+            self._parse_metadata_videos("livestream", livestreams, self.livestreams)
+            self._parse_metadata_videos("shorts", shorts, self.shorts)
 
         # Go through each and report deleted
-        self._report_deleted(self.videos)
-        self._report_deleted(self.livestreams)
-        self._report_deleted(self.shorts)
+        with self.metrics.span("report_deleted", len(self._index)):
+            self._report_deleted(self.videos)
+            self._report_deleted(self.livestreams)
+            self._report_deleted(self.shorts)
 
     def download(self, config: DownloadConfig):
         """Downloads all videos which haven't already been downloaded"""
         # Clean out old part files
         self._clean_parts()
 
-        # Create settings for the downloader
+        # Curate list of non-downloaded videos and stop if there's nothing to download
+        not_downloaded = self._curate(config)
+        if len(not_downloaded) == 0:
+            return
+        fmt_num = (
+            "a new video"
+            if len(not_downloaded) == 1
+            else f"{len(not_downloaded)} new videos"
+        )
+        print(f"Downloading {fmt_num}..")
+
+        # Share the curated list between workers
+        queue: Queue[Video] = Queue()
+        for video in not_downloaded:
+            queue.put(video)
+
+        def worker():
+            """Downloads videos from the queue one at a time with it's own downloader until it's empty"""
+            with YoutubeDL(self._download_settings(config)) as ydl:
+                while True:
+                    try:
+                        video = queue.get_nowait()
+                    except Empty:
+                        return
+                    self._download_video(ydl, video, config)
+
+        # Start workers and wait for them all to finish
+        workers = min(config.workers, len(not_downloaded))
+        with self.metrics.span("download", len(not_downloaded)), ThreadPoolExecutor(
+            workers
+        ) as ex:
+            for future in [ex.submit(worker) for _ in range(workers)]:
+                future.result()
+
+    def _download_settings(self, config: DownloadConfig) -> dict[str, Any]:
+        """Creates settings for a video downloader"""
         settings = {
             # Set the output path
             "outtmpl": f"{self.path}/videos/%(id)s.%(ext)s",
             # Centralized logger hook for ignoring all stdout
             "logger": VideoLogger(),
             # Logger hook for download progress
-            "progress_hooks": [VideoLogger.downloading],
+            "progress_hooks": [VideoLogger.downloading, self._hook_downloaded],
+            # Final filename hook after merging/post-processing so the index points at the real file
+            "post_hooks": [self._index_file],
         }
         if config.format is not None:
             settings["format"] = config.format
+        return settings
+
+    def _download_video(self, ydl: YoutubeDL, video: Video, config: DownloadConfig):
+        """Downloads a single video, retrying it on unknown errors until it's out of retries"""
+        for i in range(config.retries + 1):
+            try:
+                ydl.download([video.url()])
+                self.metrics.add("videos_downloaded")
+                return
+            except Exception as exception:
+                # Special handling for private/deleted videos which are archived
+                msg = exception.msg if isinstance(exception, DownloadError) else ""
+                if (
+                    "Private video" in msg
+                    or "This video has been removed by the uploader" in msg
+                ):
+                    # Skip video
+                    _print_skip(video, "deleted")
+
+                    # If this is a new occurrence then set it & report
+                    # This will only happen if its deleted after getting metadata, like in a dry run
+                    if video.deleted.current() == False:
+                        self._mark_deleted(video)
+                    return
+
+                # User hasn't got ffmpeg installed and youtube hasn't got format 22
+                # NOTE: see #55 <https://github.com/Owez/yark/issues/55> to learn more
+                # NOTE: sadly yt-dlp doesn't let us access yt_dlp.utils.ContentTooShortError so we check msg
+                elif " bytes, expected " in msg:
+                    _print_skip(video, "no format found; please download ffmpeg!", True)
+                    return
+
+                # Report error and retry this video with backoff, or give up on just this video
+                retrying = i != config.retries
+                self.metrics.add("download_failures")
+                _err_dl(video.id, exception, retrying, min(5 * 2**i, 60), False)
+
+    def files(self) -> dict[str, str]:
+        """Returns index of video ids to their downloaded filenames, scanning `videos/` once on first use"""
+        # Build the index with a single directory scan
+        if self._files is None:
+            self._files = {}
+            videos = self.path / "videos"
+            if videos.exists():
+                for file in videos.iterdir():
+                    if file.suffix != ".part":
+                        self._files.setdefault(file.stem, file.name)
 
-        # Attach to the downloader
-        with YoutubeDL(settings) as ydl:
-            # Retry downloading 5 times in total for all videos
-            for i in range(5):
-                # Try to curate a list and download videos on it
-                try:
-                    # Curate list of non-downloaded videos
-                    not_downloaded = self._curate(config)
-
-                    # Stop if there's nothing to download
-                    if len(not_downloaded) == 0:
-                        break
-
-                    # Print curated if this is the first time
-                    if i == 0:
-                        fmt_num = (
-                            "a new video"
-                            if len(not_downloaded) == 1
-                            else f"{len(not_downloaded)} new videos"
-                        )
-                        print(f"Downloading {fmt_num}..")
-
-                    # Continuously try to download after private/deleted videos are found
-                    # This block gives the downloader all the curated videos and skips/reports deleted videos by filtering their exceptions
-                    while True:
-                        # Download from curated list then exit the optimistic loop
-                        try:
-                            urls = [video.url() for video in not_downloaded]
-                            ydl.download(urls)
-                            break
-
-                        # Special handling for private/deleted videos which are archived, if not we raise again
-                        except DownloadError as exception:
-                            # Video is privated or deleted
-                            if (
-                                "Private video" in exception.msg
-                                or "This video has been removed by the uploader"
-                                in exception.msg
-                            ):
-                                # Skip video from curated and get it as a return
-                                not_downloaded, video = _skip_video(
-                                    not_downloaded, "deleted"
-                                )
-
-                                # If this is a new occurrence then set it & report
-                                # This will only happen if its deleted after getting metadata, like in a dry run
-                                if video.deleted.current() == False:
-                                    self.reporter.deleted.append(video)
-                                    video.deleted.update(None, True)
-
-                            # User hasn't got ffmpeg installed and youtube hasn't got format 22
-                            # NOTE: see #55 <https://github.com/Owez/yark/issues/55> to learn more
-                            # NOTE: sadly yt-dlp doesn't let us access yt_dlp.utils.ContentTooShortError so we check msg
-                            elif " bytes, expected " in exception.msg:
-                                # Skip video from curated
-                                not_downloaded, _ = _skip_video(
-                                    not_downloaded,
-                                    "no format found; please download ffmpeg!",
-                                    True,
-                                )
-
-                            # Nevermind, normal exception
-                            else:
-                                raise exception
-
-                    # Stop if we've got them all
-                    break
-
-                # Report error and retry/stop
-                except Exception as exception:
-                    # Get around carriage return
-                    if i == 0:
-                        print()
-
-                    # Report error
-                    _err_dl("videos", exception, i != 4)
+        # Return
+        return self._files
+
+    def _hook_downloaded(self, d):
+        """Progress hook which adds finished downloads to the downloaded file index"""
+        if d["status"] == "finished" and "filename" in d:
+            self._index_file(d["filename"])
+            self.metrics.add(
+                "bytes_written", d.get("total_bytes") or d.get("downloaded_bytes") or 0
+            )
+
+    def _index_file(self, filename: str):
+        """Adds a newly downloaded file to the downloaded file index"""
+        file = Path(filename)
+        if file.suffix != ".part":
+            self.files()[file.stem] = file.name
 
     def search(self, id: str):
-        """Searches channel for a video with the corresponding `id` and returns"""
+        """Searches channel's videos, livestreams and shorts for a video with the corresponding `id` and returns"""
         # Search
-        for video in self.videos:
-            if video.id == id:
-                return video
+        video = self._index.get(id)
 
         # Raise exception if it's not found
-        raise VideoNotFoundException(f"Couldn't find {id} inside archive")
+        if video is None:
+            raise VideoNotFoundException(f"Couldn't find {id} inside archive")
+
+        # Return
+        return video
 
     def _curate(self, config: DownloadConfig) -> list[Video]:
         """Curate videos which aren't downloaded and return their urls"""
@@ -416,18 +622,76 @@ class Channel:
     def commit(self):
         """Commits (saves) archive to path; do this once you've finished all of your transactions"""
         # Save backup
-        self._backup()
+        with self.metrics.span("backup"):
+            self._backup()
 
         # Directories
         print(f"Committing {self} to file..")
+        start = time.perf_counter()
         paths = [self.path, self.path / "thumbnails", self.path / "videos"]
         for path in paths:
             if not path.exists():
                 path.mkdir()
 
         # Config
-        with open(self.path / "yark.json", "w+") as file:
-            json.dump(self._to_dict(), file)
+        if self.backend == "sqlite":
+            with Database(self.path) as database:
+                database.write(self._to_dict())
+            self.metrics.add(
+                "bytes_written", (self.path / "yark.sqlite").stat().st_size
+            )
+        else:
+            with open(self.path / "yark.json", "w+") as file:
+                json.dump(self._to_dict(), file)
+                self.metrics.add("bytes_written", file.tell())
+
+        # Journaled changes are now in the config
+        self.journal.clear()
+
+        # Known thumbnail urls
+        self.fetcher.save()
+
+        # Words of new titles and descriptions, indexing everything if there's no index yet
+        if self.search_index.built():
+            self.search_index.save()
+        else:
+            self.search_index.rebuild(self)
+
+        # Video refresh times
+        if self._refreshed is not None:
+            with open(self.path / "yark.refreshed.json", "w+") as file:
+                json.dump(self._refreshed, file)
+        self.stamp = _stamp(self.path)
+        self.metrics.record("commit", start, len(self._index))
+
+    def convert(self, backend: str):
+        """Converts archive to be stored as a different `backend`, either `json` or `sqlite`, removing the old file"""
+        # Commit in the new format, which also backs up the existing archive to `yark.bak` or `yark.sqlite.bak`
+        old = self.backend
+        self.backend = backend
+        self.commit()
+
+        # Remove the old format now that it's converted
+        if old != backend:
+            (self.path / ("yark.json" if old == "json" else "yark.sqlite")).unlink()
+
+    def commit_note(self, op: str, note: Note):
+        """Commits a note being added, updated or deleted (the `op`) to the journal and search index instead of rewriting the whole archive"""
+        self._commit_change(_note_change(op, note))
+        self.search_index.note(op, note)
+
+    def _commit_change(self, change: dict):
+        """Appends a change to the journal, folding the journal back into the archive with a full commit once it's big if nothing else has changed the archive since this channel last saw it"""
+        # Check before appending so something else changing the archive isn't mistaken for our own change
+        fresh = _stamp(self.path) == self.stamp
+        self.journal.append(change)
+        if not fresh:
+            return
+
+        # Fold the journal back in, which would overwrite anything else's changes if this channel was stale
+        self.stamp = _stamp(self.path)
+        if self.journal.size() > JOURNAL_COMPACT_SIZE:
+            self.commit()
 
     def _parse_metadata_videos(self, kind: str, i: list, bucket: list):
         """Parses metadata for a category of video into it's bucket and tells user what's happening"""
@@ -439,54 +703,74 @@ class Channel:
         # Start computing and show loading spinner
         with ThreadPoolExecutor() as ex:
             # Make future for computation of the video list
-            future = ex.submit(self._parse_metadata_videos_comp, i, bucket)
+            future = ex.submit(
+                self._parse_metadata_videos_comp, i, bucket, self._buckets[kind]
+            )
 
             # Start spinning
-            with PieSpinner(f"{msg} ") as bar:
-                # Don't show bar for 2 seconds but check if future is done
-                no_bar_time = time.time() + 2
-                while time.time() < no_bar_time:
-                    if future.done():
-                        return
-                    time.sleep(0.25)
+            with PieSpinner(f"{msg} ", file=sys.stderr) as bar:
+                # Don't show bar for 2 seconds but return as soon as future is done
+                if wait([future], timeout=2).done:
+                    return
 
                 # Spin until future is done
                 while not future.done():
                     time.sleep(0.075)
                     bar.next()
 
-    def _parse_metadata_videos_comp(self, i: list, bucket: list):
-        """Computes the actual parsing for `_parse_metadata_videos` without outputting what's happening"""
+    def _parse_metadata_videos_comp(
+        self, i: list, bucket: list, index: dict[str, Video]
+    ):
+        """Computes the actual parsing for `_parse_metadata_videos` without outputting what's happening, merging into videos of the bucket's own `index`"""
+        refreshed = self.refreshed()
+        now = datetime.utcnow().isoformat()
         for entry in i:
+            # Video only listed by an incremental refresh, it still exists but isn't due an update
+            if entry.get("_type") == "url":
+                video = index.get(entry["id"])
+                if video is not None:
+                    video.known_not_deleted = True
+                continue
+
             # Skip video if there's no formats available; happens with upcoming videos/livestreams
             if "formats" not in entry or len(entry["formats"]) == 0:
                 continue
 
-            # Updated intra-loop marker
-            updated = False
-
-            # Update video if it exists
-            for video in bucket:
-                if video.id == entry["id"]:
-                    video.update(entry)
-                    updated = True
-                    break
+            # Update video if it exists in this category
+            video = index.get(entry["id"])
+            if video is not None:
+                video.update(entry)
 
-            # Add new video if not
-            if not updated:
-                video = Video.new(entry, self)
-                bucket.append(video)
+            # Add new video if not, keeping the bucket sorted by newest
+            else:
+                try:
+                    video = Video.new(entry, self)
+                except requests.RequestException:
+                    print(
+                        Style.DIM
+                        + f"  • Couldn't fetch thumbnail for new video {entry['id']}, skipping until next refresh"
+                        + Style.NORMAL
+                    )
+                    continue
+                _insert_newest(bucket, video)
+                index[video.id] = video
+                self._index.setdefault(video.id, video)
                 self.reporter.added.append(video)
 
-        # Sort videos by newest
-        bucket.sort(reverse=True)
+            # Remember when this video was refreshed for incremental refreshes
+            refreshed[video.id] = now
 
     def _report_deleted(self, videos: list):
         """Goes through a video category to report & save those which where not marked in the metadata as deleted if they're not already known to be deleted"""
         for video in videos:
             if video.deleted.current() == False and not video.known_not_deleted:
-                self.reporter.deleted.append(video)
-                video.deleted.update(None, True)
+                self._mark_deleted(video)
+
+    def _mark_deleted(self, video: Video):
+        """Marks a video as deleted, reporting it and counting the deletion for reports"""
+        self.reporter.deleted.append(video)
+        video.deleted.update(None, True)
+        video._add_change("deleted", video.deleted.last_date())
 
     def _clean_parts(self):
         """Cleans old temporary `.part` files which where stopped during download if present"""
@@ -506,7 +790,12 @@ class Channel:
                 file.unlink()
 
     def _backup(self):
-        """Creates a backup of the existing `yark.json` file in path as `yark.bak` with added comments"""
+        """Creates a backup of the existing `yark.json` file in path as `yark.bak` with added comments, and of an existing `yark.sqlite` as `yark.sqlite.bak`"""
+        # Copy database archive
+        if Database.exists(self.path):
+            with Database(self.path) as database:
+                database.backup(self.path / "yark.sqlite.bak")
+
         # Get current archive path
         ARCHIVE_PATH = self.path / "yark.json"
 
@@ -524,24 +813,50 @@ class Channel:
                 file_backup.write(save)
 
     @staticmethod
-    def _from_dict(encoded: dict, path: Path) -> Channel:
+    def _from_dict(encoded: dict, path: Path, lazy: bool = False) -> Channel:
         """Decodes archive which is being loaded back up"""
         channel = Channel()
         channel.path = path
         channel.version = encoded["version"]
         channel.url = encoded["url"]
+        channel.backend = "json"
         channel.reporter = Reporter(channel)
+        channel.metrics = Metrics()
+        channel.fetcher = ThumbnailFetcher(path, metrics=channel.metrics)
+        channel.journal = Journal(path)
+        channel.search_index = SearchIndex(path)
+        channel.strings = None if lazy else StringPool()
+        channel.stamp = None
+        channel._files = None
+        channel._refreshed = None
         channel.videos = [
-            Video._from_dict(video, channel) for video in encoded["videos"]
+            Video._from_dict(video, channel, lazy) for video in encoded["videos"]
         ]
         channel.livestreams = [
-            Video._from_dict(video, channel) for video in encoded["livestreams"]
+            Video._from_dict(video, channel, lazy) for video in encoded["livestreams"]
         ]
         channel.shorts = [
-            Video._from_dict(video, channel) for video in encoded["shorts"]
+            Video._from_dict(video, channel, lazy) for video in encoded["shorts"]
         ]
+        channel.strings = None
+        channel._reindex()
         return channel
 
+    def _reindex(self):
+        """Rebuilds indexes of video ids to videos for each category, and across all of them for searching"""
+        self._index = {}
+        self._buckets = {}
+        for kind, videos in [
+            ("video", self.videos),
+            ("livestream", self.livestreams),
+            ("shorts", self.shorts),
+        ]:
+            index = {}
+            for video in videos:
+                index.setdefault(video.id, video)
+                self._index.setdefault(video.id, video)
+            self._buckets[kind] = index
+
     def _to_dict(self) -> dict:
         """Converts channel data to a dictionary to commit"""
         return {
@@ -556,42 +871,39 @@ class Channel:
         return self.path.name
 
 
-def _skip_video(
-    videos: list[Video],
-    reason: str,
-    warning: bool = False,
-) -> tuple[list[Video], Video]:
-    """Skips first undownloaded video in `videos`, make sure there's at least one to skip otherwise an exception will be thrown"""
-    # Find fist undownloaded video
-    for ind, video in enumerate(videos):
-        if not video.downloaded():
-            # Tell the user we're skipping over it
-            if warning:
-                print(
-                    Fore.YELLOW + f"  • Skipping {video.id} ({reason})" + Fore.RESET,
-                    file=sys.stderr,
-                )
-            else:
-                print(
-                    Style.DIM + f"  • Skipping {video.id} ({reason})" + Style.NORMAL,
-                )
-
-            # Set videos to skip over this one
-            videos = videos[ind + 1 :]
+def _insert_newest(videos: list[Video], video: Video):
+    """Inserts `video` into `videos` which is sorted by newest, placing it after any uploaded at the same time"""
+    low, high = 0, len(videos)
+    while low < high:
+        mid = (low + high) // 2
+        if video.uploaded > videos[mid].uploaded:
+            high = mid
+        else:
+            low = mid + 1
+    videos.insert(low, video)
 
-            # Return the corrected list and the video found
-            return videos, video
 
-    # Shouldn't happen, see docs
-    raise Exception(
-        "We expected to skip a video and return it but nothing to skip was found"
-    )
+def _print_skip(video: Video, reason: str, warning: bool = False):
+    """Tells the user that we're skipping over downloading `video` for some `reason`"""
+    if warning:
+        print(
+            Fore.YELLOW + f"  • Skipping {video.id} ({reason})" + Fore.RESET,
+            file=sys.stderr,
+        )
+    else:
+        print(
+            Style.DIM + f"  • Skipping {video.id} ({reason})" + Style.NORMAL,
+        )
 
 
 def _migrate_archive(
-    current_version: int, expected_version: int, encoded: dict, channel_name: str
+    current_version: int,
+    expected_version: int,
+    encoded: dict,
+    channel_name: str,
+    backup: str = "yark.bak",
 ) -> dict:
-    """Automatically migrates an archive from one version to another by bootstrapping"""
+    """Automatically migrates an archive from one version to another by bootstrapping, telling the user which `backup` file it's old version will be kept in"""
 
     def migrate_step(cur: int, encoded: dict) -> dict:
         """Step in recursion to migrate from one to another, contains migration logic"""
@@ -619,13 +931,41 @@ def _migrate_archive(
         # From version 2 to version 3
         elif cur == 2:
             # Add deleted status to every video/livestream/short
-            # NOTE: none is fine for new elements, just a slight bodge
+            now = datetime.utcnow().isoformat()
             for video in encoded["videos"]:
-                video["deleted"] = Element.new(Video._new_empty(), False)._to_dict()
+                video["deleted"] = {now: False}
             for video in encoded["livestreams"]:
-                video["deleted"] = Element.new(Video._new_empty(), False)._to_dict()
+                video["deleted"] = {now: False}
             for video in encoded["shorts"]:
-                video["deleted"] = Element.new(Video._new_empty(), False)._to_dict()
+                video["deleted"] = {now: False}
+
+        # From version 3 to version 4
+        elif cur == 3:
+            # Find dates of changes in each video/livestream/short's history
+            for video in encoded["videos"] + encoded["livestreams"] + encoded["shorts"]:
+                video["changes"] = {
+                    "title": sorted(video["title"])[1:],
+                    "description": sorted(video["description"])[1:],
+                    "deleted": sorted(
+                        date
+                        for date, value in video["deleted"].items()
+                        if value == True
+                    ),
+                }
+
+        # From version 4 to version 5
+        elif cur == 4:
+            # Diff titles and descriptions of every video/livestream/short from their previous value
+            for video in encoded["videos"] + encoded["livestreams"] + encoded["shorts"]:
+                for name in ["title", "description"]:
+                    dates = list(video[name])
+                    values = list(video[name].values())
+                    video[name] = {
+                        date: _encode_text(
+                            ind, values[ind - 1] if ind > 0 else None, value
+                        )
+                        for ind, (date, value) in enumerate(zip(dates, values))
+                    }
 
         # Unknown version
         else:
@@ -640,7 +980,7 @@ def _migrate_archive(
     # Inform user of the backup process
     print(
         Fore.YELLOW
-        + f"Automatically migrating archive from v{current_version} to v{expected_version}, a backup has been made at {channel_name}/yark.bak"
+        + f"Automatically migrating archive from v{current_version} to v{expected_version}, a backup will be made at {channel_name}/{backup} when it's saved"
         + Fore.RESET
     )
 
@@ -648,8 +988,47 @@ def _migrate_archive(
     return migrate_step(current_version, encoded)
 
 
-def _err_dl(name: str, exception: DownloadError, retrying: bool):
-    """Prints errors to stdout depending on what kind of download error occurred"""
+def _metadata_settings() -> dict[str, Any]:
+    """Settings for yt-dlp downloaders which get metadata"""
+    return {
+        # Centralized logging system; makes output fully quiet
+        "logger": VideoLogger(),
+        # Skip downloading pending livestreams (#60 <https://github.com/Owez/yark/issues/60>)
+        "ignore_no_formats_error": True,
+        # Concurrent fragment downloading for increased resilience (#109 <https://github.com/Owez/yark/issues/109>)
+        "concurrent_fragment_downloads": 8,
+    }
+
+
+def _extract_info(ydl: YoutubeDL, url: str) -> dict[str, Any]:
+    """Extracts metadata from `url` without downloading, retrying a few times before giving up"""
+    for i in range(3):
+        try:
+            res: dict[str, Any] = ydl.extract_info(url, download=False)
+            return res
+        except Exception as exception:
+            # Report error
+            retrying = i != 2
+            _err_dl("metadata", exception, retrying)
+
+            # Print retrying message
+            if retrying:
+                print(
+                    Style.DIM + f"  • Retrying metadata download.." + Style.RESET_ALL
+                )  # TODO: compat with loading bar
+
+    # Shouldn't happen, failing for the last time exits
+    raise Exception("Metadata download failed without exiting")
+
+
+def _err_dl(
+    name: str,
+    exception: DownloadError,
+    retrying: bool,
+    delay: float = 5,
+    fatal: bool = True,
+):
+    """Prints errors to stdout depending on what kind of download error occurred, waiting `delay` seconds if retrying or exiting if it's `fatal`"""
     # Default message
     msg = f"Unknown error whilst downloading {name}, details below:\n{exception}"
 
@@ -698,7 +1077,8 @@ def _err_dl(name: str, exception: DownloadError, retrying: bool):
 
     # Wait if retrying, exit if failed
     if retrying:
-        time.sleep(5)
+        time.sleep(delay)
     else:
         _err_msg(f"  • Sorry, failed to download {name}", True)
-        sys.exit(1)
+        if fatal:
+            sys.exit(1)
@@ -1,15 +1,22 @@
 """Homegrown cli for managing archives"""
 
+from datetime import datetime
 from pathlib import Path
 from colorama import Style, Fore
+from contextlib import redirect_stdout
 import sys
 import threading
+import time
 import webbrowser
 from .errors import _err_msg, ArchiveNotFoundException
+from .batch import refresh_all, shared_paths
 from .channel import Channel, DownloadConfig
+from .reporter import INTERESTING_FIELDS, _csv_lines, _ndjson_lines
+from .daemon import Daemon
+from .search import SearchIndex
 from .viewer import viewer
 
-HELP = f"yark [options]\n\n  YouTube archiving made simple.\n\nOptions:\n  new [name] [url]         Creates new archive with name and channel url\n  refresh [name] [args?]   Refreshes/downloads archive with optional config\n  view [name?]             Launches offline archive viewer website\n  report [name]            Provides a report on the most interesting changes\n\nExample:\n  $ yark new owez https://www.youtube.com/channel/UCSMdm6bUYIBN0KfS2CVuEPA\n  $ yark refresh owez\n  $ yark view owez"
+HELP = f"yark [options]\n\n  YouTube archiving made simple.\n\nOptions:\n  new [name] [url]         Creates new archive with name and channel url\n  refresh [name] [args?]   Refreshes/downloads archive with optional config\n  refresh --all [root?]    Refreshes every archive under a directory at once\n  daemon [root?] [args?]   Keeps refreshing archives under a directory on a schedule\n  view [name?]             Launches offline archive viewer website\n  report [name] [args?]    Provides a report on the most interesting changes\n  search [name] [query]    Finds videos by words in their titles, descriptions or notes\n  convert [name] [format]  Converts archive to be stored as json or sqlite\n\nExample:\n  $ yark new owez https://www.youtube.com/channel/UCSMdm6bUYIBN0KfS2CVuEPA\n  $ yark refresh owez\n  $ yark view owez"
 """User-facing help message provided from the cli"""
 
 
@@ -54,7 +61,7 @@ def _cli():
         if len(args) == 2 and args[1] == "--help":
             # NOTE: if these get more complex, separate into something like "basic config" and "advanced config"
             print(
-                f"yark refresh [name] [args?]\n\n  Refreshes/downloads archive with optional configuration.\n  If a maximum is set, unset categories won't be downloaded\n\nArguments:\n  --videos=[max]        Maximum recent videos to download\n  --shorts=[max]        Maximum recent shorts to download\n  --livestreams=[max]   Maximum recent livestreams to download\n  --skip-metadata       Skips downloading metadata\n  --skip-download       Skips downloading content\n  --format=[str]        Downloads using custom yt-dlp format for advanced users\n\n Example:\n  $ yark refresh demo\n  $ yark refresh demo --videos=5\n  $ yark refresh demo --shorts=2 --livestreams=25\n  $ yark refresh demo --skip-download"
+                f"yark refresh [name] [args?]\nyark refresh --all [root?] [args?]\n\n  Refreshes/downloads archive with optional configuration.\n  If a maximum is set, unset categories won't be downloaded.\n  Using --all refreshes every archive under root, defaulting to here\n\nArguments:\n  --videos=[max]        Maximum recent videos to download\n  --shorts=[max]        Maximum recent shorts to download\n  --livestreams=[max]   Maximum recent livestreams to download\n  --skip-metadata       Skips downloading metadata\n  --skip-download       Skips downloading content\n  --format=[str]        Downloads using custom yt-dlp format for advanced users\n  --incremental         Only gets full metadata for new videos and those due a refresh\n  --recent=[days]       Incremental refreshes update videos uploaded in the last 14 days\n  --stale=[days]        Incremental refreshes update videos not updated in 30 days\n  --workers=[num]       Number of videos to download at once, defaults to 4\n  --retries=[num]       Times to retry a failing video download, defaults to 4\n  --metadata-jobs=[num] Archives getting metadata at once with --all, defaults to 4\n  --download-jobs=[num] Archives downloading at once with --all, defaults to 2\n  --record[=file]       Saves downloaded metadata, to the archive's recordings folder by default\n  --replay=[file]       Uses recorded metadata instead of downloading it\n  --metrics=[file]      Appends timings and counts of each refresh phase as json lines\n  --prometheus=[path]   Writes timings and counts as a prometheus textfile, or into a directory\n  --report=[path]       Writes what changed as json lines, or csv if it ends in .csv, or into a directory\n\n Example:\n  $ yark refresh demo\n  $ yark refresh demo --videos=5\n  $ yark refresh demo --shorts=2 --livestreams=25\n  $ yark refresh demo --skip-download\n  $ yark refresh demo --incremental --recent=7\n  $ yark refresh demo --skip-download --replay=demo/recordings/2023-01-01T00-00-00.json.gz\n  $ yark refresh --all channels --incremental --download-jobs=4"
             )
             sys.exit(0)
 
@@ -63,9 +70,20 @@ def _cli():
             _err_msg("Please provide the archive name")
             sys.exit(1)
 
+        # Refreshing every archive under a root directory
+        refresh_root = None
+        config_args = args[2:]
+        if args[1] == "--all":
+            refresh_root = Path(".")
+            if len(args) > 2 and not args[2].startswith("--"):
+                refresh_root = Path(args[2])
+                config_args = args[3:]
+        metadata_jobs = 4
+        download_jobs = 2
+
         # Figure out configuration
         config = DownloadConfig()
-        if len(args) > 2:
+        if len(config_args) > 0:
 
             def parse_value(config_arg: str) -> str:
                 return config_arg.split("=")[1]
@@ -83,7 +101,7 @@ def _cli():
                     sys.exit(1)
 
             # Go through each configuration argument
-            for config_arg in args[2:]:
+            for config_arg in config_args:
                 # Video maximum
                 if config_arg.startswith("--videos="):
                     config.max_videos = parse_maximum_int(config_arg)
@@ -108,6 +126,59 @@ def _cli():
                 elif config_arg.startswith("--format="):
                     config.format = parse_value(config_arg)
 
+                # Incremental metadata refresh
+                elif config_arg == "--incremental":
+                    config.incremental = True
+
+                # Days since upload to keep refreshing videos incrementally
+                elif config_arg.startswith("--recent="):
+                    config.refresh_recent = parse_maximum_int(config_arg)
+
+                # Days since last refresh to refresh videos incrementally again
+                elif config_arg.startswith("--stale="):
+                    config.refresh_stale = parse_maximum_int(config_arg)
+
+                # Concurrent video downloads
+                elif config_arg.startswith("--workers="):
+                    config.workers = max(parse_maximum_int(config_arg), 1)
+
+                # Retries per video download
+                elif config_arg.startswith("--retries="):
+                    config.retries = max(parse_maximum_int(config_arg), 0)
+
+                # Archives getting metadata at once when refreshing all
+                elif config_arg.startswith("--metadata-jobs="):
+                    metadata_jobs = max(parse_maximum_int(config_arg), 1)
+
+                # Archives downloading at once when refreshing all
+                elif config_arg.startswith("--download-jobs="):
+                    download_jobs = max(parse_maximum_int(config_arg), 1)
+
+                # Record downloaded metadata
+                elif config_arg == "--record":
+                    config.record = True
+                elif config_arg.startswith("--record="):
+                    config.record = Path(parse_value(config_arg))
+
+                # Replay recorded metadata
+                elif config_arg.startswith("--replay="):
+                    config.replay = Path(parse_value(config_arg))
+                    if not config.replay.exists():
+                        _err_msg(f"Recording {config.replay} doesn't exist")
+                        sys.exit(1)
+
+                # Timings and counts as json lines
+                elif config_arg.startswith("--metrics="):
+                    config.metrics = Path(parse_value(config_arg))
+
+                # Timings and counts as a prometheus textfile
+                elif config_arg.startswith("--prometheus="):
+                    config.prometheus = Path(parse_value(config_arg))
+
+                # Machine-readable report
+                elif config_arg.startswith("--report="):
+                    config.report = Path(parse_value(config_arg))
+
                 # Unknown argument
                 else:
                     print(HELP, file=sys.stderr)
@@ -119,22 +190,90 @@ def _cli():
         # Submit config settings
         config.submit()
 
+        # Refresh all archives in parallel
+        if refresh_root is not None:
+            _err_shared_paths(config)
+            try:
+                results = refresh_all(
+                    refresh_root, config, metadata_jobs, download_jobs
+                )
+            except ArchiveNotFoundException:
+                _err_msg(f"Couldn't find any archives under {refresh_root}")
+                sys.exit(1)
+            sys.exit(0 if all(result.ok for result in results) else 1)
+
         # Refresh channel using config context
         try:
             channel = Channel.load(args[1])
             if config.skip_metadata:
                 print("Skipping metadata download..")
             else:
-                channel.metadata()
+                channel.metadata(config)
             if config.skip_download:
                 print("Skipping videos/livestreams/shorts download..")
             else:
                 channel.download(config)
             channel.commit()
+            channel.metrics.emit(str(channel), config.metrics, config.prometheus)
             channel.reporter.print()
+            if config.report is not None:
+                channel.reporter.export(config.report)
         except ArchiveNotFoundException:
             _err_archive_not_found()
 
+    # Daemon
+    elif args[0] == "daemon":
+        # More help
+        if len(args) == 2 and args[1] == "--help":
+            print(
+                f"yark daemon [root?] [args?]\n\n  Keeps every archive under root, defaulting to here, loaded and refreshes them on a schedule.\n  Recently uploaded and fast-changing videos are refreshed every few hours, stale ones every couple of weeks.\n  The schedule is saved to yark-daemon.json in root so restarts carry on from where they were\n\nArguments:\n  --skip-download       Only refreshes metadata\n  --format=[str]        Downloads using custom yt-dlp format for advanced users\n  --workers=[num]       Number of videos to download at once, defaults to 4\n  --metrics=[file]      Appends timings and counts of each refresh phase as json lines\n  --prometheus=[path]   Writes timings and counts as a prometheus textfile, or into a directory\n  --report=[path]       Writes what changed as json lines, or csv if it ends in .csv, or into a directory\n  --once                Refreshes whatever's due right now and exits, for use with cron\n\n Example:\n  $ yark daemon channels\n  $ yark daemon channels --skip-download --once"
+            )
+            sys.exit(0)
+
+        # Figure out configuration
+        root = Path(".")
+        daemon_args = args[1:]
+        if len(daemon_args) > 0 and not daemon_args[0].startswith("--"):
+            root = Path(daemon_args[0])
+            daemon_args = daemon_args[1:]
+        config = DownloadConfig()
+        once = False
+        for config_arg in daemon_args:
+            if config_arg == "--skip-download":
+                config.skip_download = True
+            elif config_arg.startswith("--format="):
+                config.format = config_arg.split("=")[1]
+            elif config_arg.startswith("--workers="):
+                try:
+                    config.workers = max(int(config_arg.split("=")[1]), 1)
+                except:
+                    _err_msg(f"Invalid number of workers '{config_arg[10:]}' provided")
+                    sys.exit(1)
+            elif config_arg.startswith("--metrics="):
+                config.metrics = Path(config_arg.split("=")[1])
+            elif config_arg.startswith("--prometheus="):
+                config.prometheus = Path(config_arg.split("=")[1])
+            elif config_arg.startswith("--report="):
+                config.report = Path(config_arg.split("=")[1])
+            elif config_arg == "--once":
+                once = True
+            else:
+                print(HELP, file=sys.stderr)
+                _err_msg(
+                    f"\nError: Unknown configuration '{config_arg}' provided for daemon"
+                )
+                sys.exit(1)
+
+        # Run until stopped
+        if not root.exists():
+            _err_msg(f"Directory {root} doesn't exist")
+            sys.exit(1)
+        _err_shared_paths(config)
+        try:
+            Daemon(root, config).run(once)
+        except KeyboardInterrupt:
+            print("\nStopping daemon..")
+
     # View
     elif args[0] == "view":
         # More help
@@ -198,13 +337,130 @@ def _cli():
 
     # Report
     elif args[0] == "report":
+        # More help
+        if len(args) == 2 and args[1] == "--help":
+            print(
+                f"yark report [name] [args?]\n\n  Provides a report on the most interesting changes to videos,\n  like their titles, descriptions or them being deleted.\n\nArguments:\n  --since [date]   Only counts changes made after a date like 2023-01-31\n  --format=[str]   Prints rows of ndjson or csv instead for other tools to read\n\n Example:\n  $ yark report foobar\n  $ yark report foobar --since 2023-01-31\n  $ yark report foobar --format=csv > changes.csv"
+            )
+            sys.exit(0)
+
         # Bad arguments
         if len(args) < 2:
             _err_msg("Please provide the archive name")
             sys.exit(1)
 
-        channel = Channel.load(Path(args[1]))
-        channel.reporter.interesting_changes()
+        # Cutoff date, given as `--since=[date]` or `--since [date]`, and output format
+        since = None
+        format = None
+        report_args = " ".join(args[2:]).replace("--since ", "--since=").split()
+        for report_arg in report_args:
+            if report_arg.startswith("--since="):
+                try:
+                    since = datetime.fromisoformat(report_arg.split("=")[1])
+                except ValueError:
+                    _err_msg(
+                        f"The value '{report_arg.split('=')[1]}' isn't a valid date, please use a format like 2023-01-31"
+                    )
+                    sys.exit(1)
+            elif report_arg in ["--format=ndjson", "--format=csv"]:
+                format = report_arg.split("=")[1]
+            else:
+                _err_msg(f"Unknown configuration '{report_arg}' provided for report")
+                sys.exit(1)
+
+        # Report as coloured text
+        try:
+            if format is None:
+                channel = Channel.load(Path(args[1]), lazy=True)
+                channel.reporter.interesting_changes(since)
+
+            # Report as rows on stdout, keeping everything else on stderr so it can be piped
+            else:
+                with redirect_stdout(sys.stderr):
+                    channel = Channel.load(Path(args[1]), lazy=True)
+                rows = channel.reporter.interesting_rows(since)
+                lines = (
+                    _csv_lines(rows, INTERESTING_FIELDS)
+                    if format == "csv"
+                    else _ndjson_lines(rows)
+                )
+                for line in lines:
+                    sys.stdout.write(line)
+        except ArchiveNotFoundException:
+            _err_archive_not_found()
+
+    # Search
+    elif args[0] == "search":
+        # More help
+        if len(args) == 2 and args[1] == "--help":
+            print(
+                f'yark search [name] [query] [args?]\n\n  Finds videos with every word of the query in their current or past\n  titles and descriptions, or in their notes, best matches first.\n\nArguments:\n  --limit=[num]   Most videos to show, defaults to 20\n\n Example:\n  $ yark search foobar minecraft\n  $ yark search foobar "live q&a" --limit=5'
+            )
+            sys.exit(0)
+
+        # Bad arguments
+        if len(args) < 3:
+            _err_msg("Please provide the archive name and what to search for")
+            sys.exit(1)
+        path = Path(args[1])
+        if not path.exists():
+            _err_archive_not_found()
+        limit = 20
+        words = []
+        for arg in args[2:]:
+            if arg.startswith("--limit="):
+                try:
+                    limit = int(arg.split("=")[1])
+                except ValueError:
+                    _err_msg(f"The value '{arg.split('=')[1]}' isn't a valid limit")
+                    sys.exit(1)
+            else:
+                words.append(arg)
+
+        # Build index for archives which have never had one
+        index = SearchIndex(path)
+        if not index.built():
+            channel = Channel.load(path, lazy=True)
+            print(f"Indexing {channel} for searching..")
+            index.rebuild(channel)
+
+        # Search
+        start = time.perf_counter()
+        hits = index.query(" ".join(words), limit)
+        took = (time.perf_counter() - start) * 1000
+        for hit in hits:
+            print(
+                f"  • {hit.title} "
+                + Style.DIM
+                + f"{hit.id} ({hit.score:g})"
+                + Style.NORMAL
+            )
+        print(Style.DIM + f"Found {len(hits)} videos in {took:.1f}ms" + Style.NORMAL)
+
+    # Convert
+    elif args[0] == "convert":
+        # More help
+        if len(args) == 2 and args[1] == "--help":
+            print(
+                f"yark convert [name] [format]\n\n  Converts archive to be stored in another format.\n\nFormats:\n  json     Single yark.json file, the default\n  sqlite   SQLite database, which the viewer reads a video at a time from\n\n Example:\n  $ yark convert foobar sqlite"
+            )
+            sys.exit(0)
+
+        # Bad arguments
+        if len(args) < 3:
+            _err_msg("Please provide the archive name and the format to convert to")
+            sys.exit(1)
+        if args[2] not in ["json", "sqlite"]:
+            _err_msg(f"Unknown format '{args[2]}', please use json or sqlite")
+            sys.exit(1)
+
+        # Convert
+        try:
+            channel = Channel.load(Path(args[1]), lazy=True)
+            print(f"Converting {channel} to {args[2]}..")
+            channel.convert(args[2])
+        except ArchiveNotFoundException:
+            _err_archive_not_found()
 
     # Unknown
     else:
@@ -213,6 +469,16 @@ def _cli():
         sys.exit(1)
 
 
+def _err_shared_paths(config: DownloadConfig):
+    """Errors if many archives are being refreshed and they'd all write to the same file"""
+    shared = shared_paths(config)
+    if len(shared) != 0:
+        _err_msg(
+            f"Every archive would write to the same file with {', '.join(shared)}, please give an existing directory for --report/--prometheus or use --record without a file"
+        )
+        sys.exit(1)
+
+
 def _err_archive_not_found():
     """Errors out the user if the archive doesn't exist"""
     _err_msg("Archive doesn't exist, please make sure you typed it's name correctly!")
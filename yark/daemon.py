@@ -0,0 +1,264 @@
+"""Long-running refresh daemon which keeps archives loaded and refreshes them on a tiered schedule"""
+
+from __future__ import annotations
+from copy import copy
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+import json
+import time
+from colorama import Fore, Style
+from .batch import discover
+from .channel import Channel, DownloadConfig
+from .video import Video
+from .utils import _stamp
+
+TIERS = {
+    "hot": timedelta(hours=6),
+    "warm": timedelta(days=2),
+    "cold": timedelta(days=14),
+}
+"""How often videos and channels in each tier are refreshed"""
+
+HOT_AGE = timedelta(days=7)
+"""Videos uploaded more recently than this are always hot, as are channels which uploaded one"""
+
+WARM_AGE = timedelta(days=60)
+"""Videos uploaded more recently than this are at least warm"""
+
+CHANNEL_WARM_AGE = timedelta(days=180)
+"""Channels which haven't uploaded for this long are cold"""
+
+HOT_RATE = 1000
+"""Views per day for a video to be hot"""
+
+WARM_RATE = 50
+"""Views per day for a video to be at least warm"""
+
+RATE_WINDOW = timedelta(days=7)
+"""Window of view history used to work out how fast a video's views are changing"""
+
+RETRY_DELAY = timedelta(minutes=30)
+"""Time to wait before retrying an archive whose refresh failed"""
+
+DISCOVER_INTERVAL = 10 * 60
+"""Most seconds to sleep for before looking for new archives again"""
+
+
+class Daemon:
+    """Refresh daemon for every archive under a root directory, with it's schedule saved to `yark-daemon.json` in the root"""
+
+    root: Path
+    config: DownloadConfig
+    state: dict[str, dict[str, Any]]
+    channels: dict[str, tuple[tuple, Channel]]
+
+    def __init__(self, root: Path, config: DownloadConfig) -> None:
+        self.root = root
+        self.config = config
+        self.channels = {}
+        file = self._state_path()
+        self.state = json.load(open(file, "r")) if file.exists() else {}
+
+    def run(self, once: bool = False):
+        """Refreshes archives as they become due forever, or just those due right now if `once` is set"""
+        while True:
+            # Refresh everything that's due, most overdue first
+            self._discover()
+            now = datetime.utcnow()
+            for key in sorted(self.state, key=lambda key: self._next(key)):
+                if self._next(key) <= now:
+                    self.refresh(key)
+            if once:
+                return
+
+            # Sleep until the next archive is due
+            wait = min(
+                [
+                    (self._next(key) - datetime.utcnow()).total_seconds()
+                    for key in self.state
+                ]
+                + [DISCOVER_INTERVAL]
+            )
+            if wait > 0:
+                print(Style.DIM + f"Sleeping for {wait:.0f}s.." + Style.NORMAL)
+                time.sleep(wait)
+
+    def refresh(self, key: str):
+        """Refreshes an archive's channel listing and it's videos which are due, then reschedules them"""
+        state = self.state[key]
+        now = datetime.utcnow()
+        try:
+            # Only get full metadata for new videos and those due
+            channel = self._channel(key)
+            due = {
+                id
+                for id, video in state["videos"].items()
+                if datetime.fromisoformat(video["next"]) <= now
+            }
+            print(
+                Style.BRIGHT
+                + f"Refreshing {channel} ({state['tier']}) with {len(due)} videos due.."
+                + Style.NORMAL
+            )
+            config = copy(self.config)
+            config.incremental = True
+            config.refresh_ids = due
+            channel.reporter.reset()
+            channel.metrics.reset()
+            channel.metadata(config)
+            if not config.skip_download:
+                channel.download(config)
+            channel.commit()
+            channel.metrics.emit(key, config.metrics, config.prometheus)
+            channel.reporter.print()
+            if config.report is not None:
+                channel.reporter.export(config.report, key)
+
+            # Reschedule from the freshly updated history
+            self._schedule(key, channel, now, due)
+            self.channels[key] = (_stamp(channel.path), channel)
+
+        # Keep going with other archives if one fails, reloading it next time as it could be half-updated
+        except (Exception, SystemExit) as e:
+            print(Fore.RED + f"Couldn't refresh {key}: {e}" + Fore.RESET)
+            self.channels.pop(key, None)
+            retry = now + RETRY_DELAY
+            for scheduled in [state] + list(state["videos"].values()):
+                if datetime.fromisoformat(scheduled["next"]) < retry:
+                    scheduled["next"] = retry.isoformat()
+
+        # Save schedule so a restart resumes it
+        self._save()
+
+    def _discover(self):
+        """Finds archives under the root, scheduling any new ones from their existing history and forgetting any which are gone"""
+        # Schedule new archives
+        found = set()
+        for path in discover(self.root):
+            key = path.relative_to(self.root).as_posix()
+            found.add(key)
+            if key not in self.state:
+                now = datetime.utcnow()
+                self.state[key] = {"tier": "warm", "next": None, "videos": {}}
+                try:
+                    self._schedule(key, self._channel(key), now, set())
+
+                # Keep going with other archives if one can't be loaded, trying it again later
+                except (Exception, SystemExit) as e:
+                    print(Fore.RED + f"Couldn't load {key}: {e}" + Fore.RESET)
+                    self.channels.pop(key, None)
+                    self.state[key]["next"] = (now + RETRY_DELAY).isoformat()
+
+        # Forget removed archives
+        for key in [key for key in self.state if key not in found]:
+            print(Style.DIM + f"Forgetting {key} as it's gone" + Style.NORMAL)
+            del self.state[key]
+            self.channels.pop(key, None)
+        self._save()
+
+    def _channel(self, key: str) -> Channel:
+        """Gets loaded channel for an archive, reloading it if something else has changed it since"""
+        path = self.root / key
+        stamp = _stamp(path)
+        cached = self.channels.get(key)
+        if cached is None or cached[0] != stamp:
+            channel = Channel.load(path)
+            self.channels[key] = (stamp, channel)
+            return channel
+        return cached[1]
+
+    def _schedule(self, key: str, channel: Channel, now: datetime, refreshed: set[str]):
+        """Works out tiers of an archive and it's videos, scheduling those just refreshed or never scheduled"""
+        state = self.state[key]
+        videos = state["videos"]
+        last_refreshed = channel.refreshed()
+        found = channel.videos + channel.livestreams + channel.shorts
+        for video in found:
+            # Already scheduled and not refreshed this time
+            if video.id in videos and video.id not in refreshed:
+                continue
+
+            # Schedule from when it was last refreshed, or when it's views last changed if we don't know
+            tier = _video_tier(video, now)
+            since = last_refreshed.get(video.id)
+            if video.id in refreshed:
+                since = now
+            elif since is not None:
+                since = datetime.fromisoformat(since)
+            else:
+                since = video.views.last_date()
+            videos[video.id] = {"tier": tier, "next": (since + TIERS[tier]).isoformat()}
+
+        # Forget removed videos
+        ids = {video.id for video in found}
+        for id in [id for id in videos if id not in ids]:
+            del videos[id]
+
+        # Channel listing, which finds new uploads and is due straight away for new archives
+        state["tier"] = _channel_tier(found, now)
+        if state["next"] is None:
+            state["next"] = now.isoformat()
+        elif len(refreshed) != 0 or datetime.fromisoformat(state["next"]) <= now:
+            state["next"] = (now + TIERS[state["tier"]]).isoformat()
+
+    def _next(self, key: str) -> datetime:
+        """Gets when an archive is next due, which is when it's listing or any of it's videos are"""
+        state = self.state[key]
+        return min(
+            datetime.fromisoformat(date)
+            for date in [state["next"]]
+            + [video["next"] for video in state["videos"].values()]
+        )
+
+    def _state_path(self) -> Path:
+        """Gets path of the saved schedule"""
+        return self.root / "yark-daemon.json"
+
+    def _save(self):
+        """Saves schedule atomically so it's never half-written"""
+        path = self._state_path()
+        temp = path.with_suffix(".tmp")
+        with open(temp, "w+") as file:
+            json.dump(self.state, file)
+        temp.replace(path)
+
+
+def _views_per_day(video: Video, now: datetime) -> float:
+    """Works out how fast a video's views have been growing recently from it's history"""
+    # Growth over the recent window
+    growth = video.views.growth(now - RATE_WINDOW)
+    if growth is not None:
+        return growth / RATE_WINDOW.days
+
+    # Growth over the whole history if it's shorter than the window
+    growth = video.views.growth()
+    days = (video.views.last_date() - video.views.first_date()).total_seconds() / (
+        24 * 60 * 60
+    )
+    if growth is None or days <= 0:
+        return 0.0
+    return growth / days
+
+
+def _video_tier(video: Video, now: datetime) -> str:
+    """Gets tier for a video from it's upload date and how fast it's views are changing"""
+    age = now - video.uploaded
+    rate = _views_per_day(video, now)
+    if age < HOT_AGE or rate >= HOT_RATE:
+        return "hot"
+    elif age < WARM_AGE or rate >= WARM_RATE:
+        return "warm"
+    return "cold"
+
+
+def _channel_tier(videos: list[Video], now: datetime) -> str:
+    """Gets tier for a channel's listing from how recently it last uploaded"""
+    if len(videos) == 0:
+        return "warm"
+    latest = max(video.uploaded for video in videos)
+    if now - latest < HOT_AGE:
+        return "hot"
+    elif now - latest < CHANNEL_WARM_AGE:
+        return "warm"
+    return "cold"
@@ -0,0 +1,324 @@
+"""SQLite archive format which stores the same data as `yark.json` in rows so single videos can be read without decoding everything and commits only rewrite the videos which changed"""
+
+from __future__ import annotations
+from pathlib import Path
+from typing import Any
+import hashlib
+import json
+import sqlite3
+import threading
+
+CATEGORIES = ["videos", "livestreams", "shorts"]
+"""Categories of videos in an archive, which are also the keys used for them in `yark.json`"""
+
+ELEMENTS = ["title", "description", "views", "likes", "deleted"]
+"""Elements of a video which are stored as history rows, thumbnails have their own table"""
+
+COLUMNS = ["id", "uploaded", "width", "height", "thumbnail", "notes"] + ELEMENTS
+"""Keys of an encoded video which have their own columns or tables, anything else goes in it's `extra` column"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS videos (
+    category TEXT NOT NULL,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    uploaded TEXT NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    extra TEXT NOT NULL,
+    digest TEXT,
+    PRIMARY KEY (category, id)
+);
+CREATE INDEX IF NOT EXISTS videos_position ON videos (category, position);
+CREATE TABLE IF NOT EXISTS elements (
+    category TEXT NOT NULL,
+    video TEXT NOT NULL,
+    name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS elements_video ON elements (category, video, name);
+CREATE TABLE IF NOT EXISTS thumbnails (
+    category TEXT NOT NULL,
+    video TEXT NOT NULL,
+    date TEXT NOT NULL,
+    id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS thumbnails_video ON thumbnails (category, video);
+CREATE TABLE IF NOT EXISTS notes (
+    category TEXT NOT NULL,
+    video TEXT NOT NULL,
+    id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    body TEXT
+);
+CREATE INDEX IF NOT EXISTS notes_video ON notes (category, video);
+"""
+"""Tables of the database, rows of history/notes are kept in order using their rowid and each video's `digest` tells if it's changed since it was written"""
+
+
+class Database:
+    """SQLite archive stored as `yark.sqlite`, reading and writing the same encoded dictionaries as `yark.json`"""
+
+    path: Path
+    conn: sqlite3.Connection
+    lock: threading.Lock
+
+    def __init__(self, path: Path) -> None:
+        self.path = path / "yark.sqlite"
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.executescript(SCHEMA)
+
+        # Databases from before videos had digests get them on their next write
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(videos)")]
+        if "digest" not in columns:
+            self.conn.execute("ALTER TABLE videos ADD COLUMN digest TEXT")
+
+    @staticmethod
+    def exists(path: Path) -> bool:
+        """Checks if the archive at `path` is stored in a database"""
+        return (path / "yark.sqlite").exists()
+
+    def write(self, encoded: dict):
+        """Writes an encoded archive in one transaction, only rewriting the rows of videos which have changed since it was last written"""
+        with self.conn:
+            # Channel-wide values like the version and url
+            self.conn.execute("DELETE FROM meta")
+            self.conn.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [
+                    (key, json.dumps(value))
+                    for key, value in encoded.items()
+                    if key not in CATEGORIES
+                ],
+            )
+
+            # What each stored video looked like when it was last written
+            stored = {
+                (category, id): (position, digest)
+                for category, id, position, digest in self.conn.execute(
+                    "SELECT category, id, position, digest FROM videos"
+                )
+            }
+
+            # Each category of videos, rewriting changed ones and moving the rest
+            for category in CATEGORIES:
+                for position, video in enumerate(encoded[category]):
+                    digest = _digest(video)
+                    existing = stored.pop((category, video["id"]), None)
+                    if existing is None:
+                        self._write_video(category, position, video, digest)
+                    elif existing[1] != digest:
+                        self._delete_video(category, video["id"])
+                        self._write_video(category, position, video, digest)
+                    elif existing[0] != position:
+                        self.conn.execute(
+                            "UPDATE videos SET position = ? WHERE category = ? AND id = ?",
+                            (position, category, video["id"]),
+                        )
+
+            # Videos which aren't in the archive anymore
+            for category, id in stored:
+                self._delete_video(category, id)
+
+    def read(self, lazy: bool = False) -> dict:
+        """Reads the entire archive back into it's encoded dictionary, or only the videos themselves if `lazy` so each of their histories and notes are read when they're first used"""
+        # Channel-wide values
+        encoded: dict[str, Any] = {
+            key: json.loads(value)
+            for key, value in self.conn.execute("SELECT key, value FROM meta")
+        }
+
+        # Videos in order
+        videos = {}
+        for category in CATEGORIES:
+            encoded[category] = []
+            for row in self.conn.execute(
+                "SELECT * FROM videos WHERE category = ? ORDER BY position",
+                (category,),
+            ):
+                video = _decode_video(row)
+                if lazy:
+                    video = _LazyVideo(self, category, video)
+                else:
+                    video["thumbnail"] = {}
+                    video["notes"] = []
+                    video.update({name: {} for name in ELEMENTS})
+                encoded[category].append(video)
+                videos[(category, video["id"])] = video
+        if lazy:
+            return encoded
+
+        # Fill in histories and notes with one pass over each table
+        for category, id, name, date, value in self.conn.execute(
+            "SELECT * FROM elements ORDER BY rowid"
+        ):
+            videos[(category, id)][name][date] = json.loads(value)
+        for category, id, date, thumbnail in self.conn.execute(
+            "SELECT * FROM thumbnails ORDER BY rowid"
+        ):
+            videos[(category, id)]["thumbnail"][date] = thumbnail
+        for row in self.conn.execute("SELECT * FROM notes ORDER BY rowid"):
+            videos[(row[0], row[1])]["notes"].append(_decode_note(row))
+
+        # Return
+        return encoded
+
+    def history(self, category: str, id: str, name: str) -> dict:
+        """Reads the encoded history of one element of a video, such as it's `views` or `thumbnail`"""
+        with self.lock:
+            if name == "thumbnail":
+                return {
+                    date: thumbnail
+                    for date, thumbnail in self.conn.execute(
+                        "SELECT date, id FROM thumbnails WHERE category = ? AND video = ? ORDER BY rowid",
+                        (category, id),
+                    )
+                }
+            return {
+                date: json.loads(value)
+                for date, value in self.conn.execute(
+                    "SELECT date, value FROM elements WHERE category = ? AND video = ? AND name = ? ORDER BY rowid",
+                    (category, id, name),
+                )
+            }
+
+    def notes(self, category: str, id: str) -> list[dict]:
+        """Reads the encoded notes of a video"""
+        with self.lock:
+            return [
+                _decode_note(row)
+                for row in self.conn.execute(
+                    "SELECT * FROM notes WHERE category = ? AND video = ? ORDER BY rowid",
+                    (category, id),
+                )
+            ]
+
+    def backup(self, path: Path):
+        """Copies a consistent snapshot of the database to `path`"""
+        backup = sqlite3.connect(path)
+        try:
+            self.conn.backup(backup)
+        finally:
+            backup.close()
+
+    def close(self):
+        """Closes connection to the database"""
+        self.conn.close()
+
+    def __enter__(self) -> Database:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _write_video(self, category: str, position: int, video: dict, digest: str):
+        """Inserts an encoded video and all of it's rows"""
+        # Video itself
+        extra = {key: value for key, value in video.items() if key not in COLUMNS}
+        self.conn.execute(
+            "INSERT INTO videos VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                category,
+                video["id"],
+                position,
+                video["uploaded"],
+                video["width"],
+                video["height"],
+                json.dumps(extra),
+                digest,
+            ),
+        )
+
+        # Element histories
+        self.conn.executemany(
+            "INSERT INTO elements VALUES (?, ?, ?, ?, ?)",
+            [
+                (category, video["id"], name, date, json.dumps(value))
+                for name in ELEMENTS
+                for date, value in video[name].items()
+            ],
+        )
+
+        # Thumbnail history
+        self.conn.executemany(
+            "INSERT INTO thumbnails VALUES (?, ?, ?, ?)",
+            [
+                (category, video["id"], date, thumbnail)
+                for date, thumbnail in video["thumbnail"].items()
+            ],
+        )
+
+        # Notes
+        self.conn.executemany(
+            "INSERT INTO notes VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    category,
+                    video["id"],
+                    note["id"],
+                    note["timestamp"],
+                    note["title"],
+                    note["body"],
+                )
+                for note in video["notes"]
+            ],
+        )
+
+    def _delete_video(self, category: str, id: str):
+        """Deletes a video and all of it's rows"""
+        self.conn.execute(
+            "DELETE FROM videos WHERE category = ? AND id = ?", (category, id)
+        )
+        for table in ["elements", "thumbnails", "notes"]:
+            self.conn.execute(
+                f"DELETE FROM {table} WHERE category = ? AND video = ?", (category, id)
+            )
+
+
+class _LazyVideo(dict):
+    """Encoded video read without it's histories and notes, which are read from the database whenever they're asked for"""
+
+    __slots__ = ("database", "category")
+
+    database: Database
+    category: str
+
+    def __init__(self, database: Database, category: str, video: dict) -> None:
+        super().__init__(video)
+        self.database = database
+        self.category = category
+
+    def __missing__(self, key: str) -> Any:
+        if key == "notes":
+            return self.database.notes(self.category, self["id"])
+        elif key == "thumbnail" or key in ELEMENTS:
+            return self.database.history(self.category, self["id"], key)
+        raise KeyError(key)
+
+
+def _digest(video: dict) -> str:
+    """Hashes an encoded video so it's rows are only rewritten when it changes"""
+    return hashlib.blake2b(
+        json.dumps(video, separators=(",", ":")).encode(), digest_size=16
+    ).hexdigest()
+
+
+def _decode_video(row: tuple) -> dict:
+    """Decodes a video row into an encoded video without it's histories and notes"""
+    _, id, _, uploaded, width, height, extra, _ = row
+    video = {"id": id, "uploaded": uploaded, "width": width, "height": height}
+    video.update(json.loads(extra))
+    return video
+
+
+def _decode_note(row: tuple) -> dict:
+    """Decodes a note row into an encoded note"""
+    _, _, id, timestamp, title, body = row
+    return {"id": id, "timestamp": timestamp, "title": title, "body": body}
@@ -0,0 +1,153 @@
+"""Pooled thumbnail fetching using conditional requests and content-addressed saving"""
+
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+import hashlib
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from .metrics import Metrics
+
+
+class ThumbnailFetcher:
+    """Downloads thumbnails over a shared connection pool, skipping unchanged ones"""
+
+    path: Path
+    workers: int
+    session: requests.Session
+    known: Optional[dict[str, dict]]
+    fetched: dict[str, str]
+    dirty: bool
+    metrics: Metrics
+
+    def __init__(
+        self,
+        path: Path,
+        workers: int = 8,
+        session: Optional[requests.Session] = None,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.path = path
+        self.workers = workers
+        self.session = session if session is not None else _new_session(workers)
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.known = None
+        self.fetched = {}
+        self.dirty = False
+
+    def prefetch(self, urls: list[str]):
+        """Fetches many thumbnails concurrently so that later calls to `fetch` for them are instant"""
+        # Only fetch each url once
+        todo = [url for url in dict.fromkeys(urls) if url not in self.fetched]
+        if len(todo) == 0:
+            return
+
+        # Load known urls before starting threads so they don't race to do it
+        self._known()
+
+        # Fetch with bounded concurrency
+        with ThreadPoolExecutor(self.workers) as ex:
+            list(ex.map(self._prefetch_one, todo))
+
+    def fetch(self, url: str) -> str:
+        """Fetches thumbnail from `url` if it's changed, saves it if it's new and returns it's id"""
+        # Already fetched during this run
+        if url in self.fetched:
+            return self.fetched[url]
+
+        # Ask the server to only send the image if it's changed since we last saw it
+        known = self._known().get(url)
+        headers = {}
+        if known is not None:
+            if known["etag"] is not None:
+                headers["If-None-Match"] = known["etag"]
+            if known["modified"] is not None:
+                headers["If-Modified-Since"] = known["modified"]
+        resp = self.session.get(url, headers=headers, timeout=30)
+        self.metrics.add("http_requests")
+        self.metrics.add("http_bytes_received", len(resp.content))
+
+        # Unchanged so we can reuse the known id without downloading anything
+        if resp.status_code == 304 and known is not None:
+            id = known["id"]
+            self.metrics.add("thumbnails_unchanged")
+
+        # Error pages and anything else which isn't an image
+        elif resp.status_code != 200:
+            resp.raise_for_status()
+            raise requests.HTTPError(
+                f"Unexpected status {resp.status_code} for thumbnail {url}",
+                response=resp,
+            )
+
+        # Hash image and save it only if we don't have it yet
+        else:
+            image = resp.content
+            id = hashlib.blake2b(
+                image, digest_size=20, usedforsecurity=False
+            ).hexdigest()
+            self._save(id, image)
+
+            # Remember validators for next time
+            self._known()[url] = {
+                "id": id,
+                "etag": resp.headers.get("ETag"),
+                "modified": resp.headers.get("Last-Modified"),
+            }
+            self.dirty = True
+
+        # Return
+        self.fetched[url] = id
+        return id
+
+    def _prefetch_one(self, url: str):
+        """Fetches a thumbnail for `prefetch`, falling back to the last one we saved from it's url if it can't be fetched"""
+        try:
+            self.fetch(url)
+        except requests.RequestException:
+            self.metrics.add("thumbnail_errors")
+            known = self._known().get(url)
+            if known is not None:
+                self.fetched[url] = known["id"]
+
+    def reset(self):
+        """Forgets thumbnails fetched during this run so the next run checks them again"""
+        self.fetched = {}
+
+    def save(self):
+        """Saves known thumbnail urls to the archive if there's anything new"""
+        if self.dirty and self.known is not None:
+            with open(self.path / "yark.thumbnails.json", "w+") as file:
+                json.dump(self.known, file)
+            self.dirty = False
+
+    def _known(self) -> dict[str, dict]:
+        """Gets known thumbnail urls with their ids and validators, loading them from the archive on first use"""
+        if self.known is None:
+            file = self.path / "yark.thumbnails.json"
+            self.known = json.load(open(file, "r")) if file.exists() else {}
+        return self.known
+
+    def _save(self, id: str, image: bytes):
+        """Saves image to it's content-addressed path unless it's already there"""
+        path = self.path / "thumbnails" / f"{id}.webp"
+        if path.exists():
+            return
+        temp = path.with_name(f"{id}.{threading.get_ident()}.tmp")
+        with open(temp, "wb+") as file:
+            file.write(image)
+        temp.replace(path)
+        self.metrics.add("bytes_written", len(image))
+        self.metrics.add("thumbnails_saved")
+
+
+def _new_session(workers: int) -> requests.Session:
+    """Creates a new requests session with a connection pool big enough for `workers`"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
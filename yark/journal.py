@@ -0,0 +1,81 @@
+"""Append-only journal of small archive changes so they don't need the whole archive to be rewritten"""
+
+from __future__ import annotations
+from pathlib import Path
+import json
+import os
+from .errors import VideoNotFoundException, NoteNotFoundException
+from .video import Note
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:
+    from .channel import Channel
+
+JOURNAL_COMPACT_SIZE = 1024 * 1024
+"""Size in bytes a journal can get to before it's folded back into `yark.json`"""
+
+
+class Journal:
+    """Journal file of changes made since the archive was last fully committed, stored as `yark.journal` beside it"""
+
+    path: Path
+
+    def __init__(self, path: Path) -> None:
+        self.path = path / "yark.journal"
+
+    def append(self, change: dict):
+        """Appends a change to the end of the journal"""
+        with open(self.path, "a") as file:
+            file.write(json.dumps(change) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def changes(self) -> Iterator[dict]:
+        """Iterates over changes in the journal in the order they were made"""
+        if not self.path.exists():
+            return
+        with open(self.path, "r") as file:
+            for line in file:
+                # Skip over a partially-written last change if we crashed whilst appending it
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def size(self) -> int:
+        """Returns size of the journal file in bytes"""
+        return self.path.stat().st_size if self.path.exists() else 0
+
+    def clear(self):
+        """Clears the journal once it's changes are in a committed archive"""
+        if self.path.exists():
+            self.path.unlink()
+
+
+def _note_change(op: str, note: Note) -> dict:
+    """Creates change for a note being added, updated or deleted"""
+    return {"kind": "note", "op": op, "video": note.video.id, "note": note._to_dict()}
+
+
+def _replay(channel: Channel, change: dict):
+    """Applies a journal change to a freshly loaded channel, changes can safely be applied more than once"""
+    # Get video this change is for, it might've been removed by a compaction that crashed
+    try:
+        video = channel.search(change["video"])
+    except VideoNotFoundException:
+        return
+
+    # Note added, updated or deleted
+    if change["kind"] == "note":
+        encoded = change["note"]
+        try:
+            existing = video.search(encoded["id"])
+        except NoteNotFoundException:
+            existing = None
+        if change["op"] == "add" and existing is None:
+            video.notes.append(Note._from_dict(video, encoded))
+        elif change["op"] == "update" and existing is not None:
+            existing.title = encoded["title"]
+            existing.body = encoded["body"]
+        elif change["op"] == "delete" and existing is not None:
+            video.notes.remove(existing)
@@ -0,0 +1,300 @@
+"""Timing and counting of what each phase of a refresh did and of what the viewer is serving, for json lines or prometheus"""
+
+from __future__ import annotations
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+import json
+import threading
+import time
+from .utils import _file_name
+
+
+class Span:
+    """Timed phase of a refresh, like parsing metadata, with how many items it went through"""
+
+    __slots__ = ("name", "start", "seconds", "items")
+
+    name: str
+    start: datetime
+    seconds: float
+    items: int
+
+    def __init__(self, name: str, start: datetime, seconds: float, items: int) -> None:
+        self.name = name
+        self.start = start
+        self.seconds = seconds
+        self.items = items
+
+
+class Metrics:
+    """Spans and counters for a channel, which can be added to from multiple threads"""
+
+    spans: list[Span]
+    counters: dict[str, int]
+    lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.spans = []
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, items: int = 0) -> Iterator[Span]:
+        """Times the phase called `name` for the duration of the context, it's `items` can be set whilst inside"""
+        span = Span(name, datetime.utcnow(), 0.0, items)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.seconds = time.perf_counter() - start
+            with self.lock:
+                self.spans.append(span)
+
+    def record(self, name: str, start: float, items: int = 0):
+        """Records a phase called `name` which started at the `time.perf_counter()` value of `start` and just ended"""
+        seconds = time.perf_counter() - start
+        with self.lock:
+            self.spans.append(
+                Span(
+                    name,
+                    datetime.utcfromtimestamp(time.time() - seconds),
+                    seconds,
+                    items,
+                )
+            )
+
+    def add(self, name: str, value: int = 1):
+        """Adds `value` to the counter called `name`"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        """Forgets everything recorded so far, ready for another refresh"""
+        with self.lock:
+            self.spans = []
+            self.counters = {}
+
+    def lines(self, channel: str) -> list[dict]:
+        """Converts spans and counters into json-friendly lines labelled with the channel they're from"""
+        with self.lock:
+            lines = [
+                {
+                    "kind": "span",
+                    "channel": channel,
+                    "name": span.name,
+                    "start": span.start.isoformat(),
+                    "seconds": round(span.seconds, 6),
+                    "items": span.items,
+                }
+                for span in self.spans
+            ]
+            lines += [
+                {"kind": "counter", "channel": channel, "name": name, "value": value}
+                for name, value in sorted(self.counters.items())
+            ]
+        return lines
+
+    def emit(
+        self,
+        channel: str,
+        jsonl: Optional[Path] = None,
+        prometheus: Optional[Path] = None,
+    ):
+        """Appends metrics for `channel` to a `jsonl` file and/or writes them to a `prometheus` textfile, which can be a directory to write `yark-[channel].prom` in"""
+        if jsonl is not None:
+            _write_jsonl(jsonl, self.lines(channel))
+        if prometheus is not None:
+            if prometheus.is_dir():
+                prometheus = prometheus / f"yark-{_file_name(channel)}.prom"
+            _write_prometheus(prometheus, channel, self)
+
+
+def _write_jsonl(path: Path, lines: list[dict]):
+    """Appends lines to a json lines file in one write so other processes can append at the same time"""
+    with open(path, "a") as file:
+        file.write("".join(json.dumps(line) + "\n" for line in lines))
+
+
+def _write_prometheus(path: Path, channel: str, metrics: Metrics):
+    """Writes metrics as a prometheus textfile, replacing it atomically so it's never scraped half-written"""
+    # Sum up repeated phases
+    phases: dict[str, list] = {}
+    with metrics.lock:
+        for span in metrics.spans:
+            phase = phases.setdefault(span.name, [0.0, 0])
+            phase[0] += span.seconds
+            phase[1] += span.items
+        counters = dict(metrics.counters)
+
+    # Format
+    label = f'channel="{_escape(channel)}"'
+    out = [
+        "# HELP yark_phase_seconds Seconds spent in each phase of the last refresh",
+        "# TYPE yark_phase_seconds gauge",
+    ]
+    for name, (seconds, _) in phases.items():
+        out.append(
+            f'yark_phase_seconds{{{label},phase="{_escape(name)}"}} {seconds:.6f}'
+        )
+    out += [
+        "# HELP yark_phase_items Items each phase of the last refresh went through",
+        "# TYPE yark_phase_items gauge",
+    ]
+    for name, (_, items) in phases.items():
+        out.append(f'yark_phase_items{{{label},phase="{_escape(name)}"}} {items}')
+    for name, value in sorted(counters.items()):
+        out.append(f"# TYPE yark_{name} gauge")
+        out.append(f"yark_{name}{{{label}}} {value}")
+    out += [
+        "# HELP yark_last_refresh_timestamp_seconds When the last refresh finished",
+        "# TYPE yark_last_refresh_timestamp_seconds gauge",
+        f"yark_last_refresh_timestamp_seconds{{{label}}} {time.time():.0f}",
+    ]
+
+    # Write
+    temp = path.with_name(path.name + ".tmp")
+    with open(temp, "w+") as file:
+        file.write("\n".join(out) + "\n")
+    temp.replace(path)
+
+
+def _escape(value: str) -> str:
+    """Escapes a prometheus label value"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+"""Upper bounds in seconds of the buckets latencies are counted into"""
+
+
+class Histogram:
+    """Counts of observed durations in each of the latency buckets, along with their total"""
+
+    __slots__ = ("buckets", "sum", "count")
+
+    buckets: list[int]
+    sum: float
+    count: int
+
+    def __init__(self) -> None:
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        """Counts a duration into it's bucket"""
+        ind = bisect_left(LATENCY_BUCKETS, seconds)
+        if ind < len(self.buckets):
+            self.buckets[ind] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def _lines(self, name: str, labels: str) -> list[str]:
+        """Formats histogram as prometheus lines with cumulative buckets, `labels` can be empty"""
+        lines = []
+        total = 0
+        prefix = f"{labels}," if labels else ""
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            total += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {total}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class ViewerMetrics:
+    """Request, cache and rendering statistics for a running viewer, which can be read by prometheus"""
+
+    lock: threading.Lock
+    requests: dict[tuple[str, str, int], int]
+    latency: dict[str, Histogram]
+    served: dict[str, int]
+    renders: dict[str, Histogram]
+    loads: Histogram
+    counters: dict[str, int]
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.latency = {}
+        self.served = {}
+        self.renders = {}
+        self.loads = Histogram()
+        self.counters = {"cache_hits": 0, "cache_loads": 0}
+
+    def request(self, route: str, method: str, status: int, seconds: float, size: int):
+        """Records a finished request to `route` which took `seconds` and sent `size` bytes"""
+        with self.lock:
+            key = (route, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault(route, Histogram()).observe(seconds)
+            self.served[route] = self.served.get(route, 0) + size
+
+    def render(self, template: str, seconds: float):
+        """Records how long a template took to render"""
+        with self.lock:
+            self.renders.setdefault(template, Histogram()).observe(seconds)
+
+    def load(self, seconds: float):
+        """Records an archive being loaded into the cache because it wasn't there or had changed"""
+        with self.lock:
+            self.counters["cache_loads"] += 1
+            self.loads.observe(seconds)
+
+    def hit(self):
+        """Records an archive being served straight from the cache"""
+        with self.lock:
+            self.counters["cache_hits"] += 1
+
+    def prometheus(self) -> str:
+        """Formats everything as prometheus text"""
+        with self.lock:
+            out = [
+                "# HELP yark_viewer_requests_total Requests handled by each route",
+                "# TYPE yark_viewer_requests_total counter",
+            ]
+            for (route, method, status), count in sorted(self.requests.items()):
+                out.append(
+                    f'yark_viewer_requests_total{{route="{_escape(route)}",method="{method}",status="{status}"}} {count}'
+                )
+            out += [
+                "# HELP yark_viewer_request_seconds Time taken to handle requests to each route",
+                "# TYPE yark_viewer_request_seconds histogram",
+            ]
+            for route, histogram in sorted(self.latency.items()):
+                out += histogram._lines(
+                    "yark_viewer_request_seconds", f'route="{_escape(route)}"'
+                )
+            out += [
+                "# HELP yark_viewer_bytes_served_total Bytes sent by each route",
+                "# TYPE yark_viewer_bytes_served_total counter",
+            ]
+            for route, size in sorted(self.served.items()):
+                out.append(
+                    f'yark_viewer_bytes_served_total{{route="{_escape(route)}"}} {size}'
+                )
+            out += [
+                "# HELP yark_viewer_template_seconds Time taken to render each template",
+                "# TYPE yark_viewer_template_seconds histogram",
+            ]
+            for template, histogram in sorted(self.renders.items()):
+                out += histogram._lines(
+                    "yark_viewer_template_seconds", f'template="{_escape(template)}"'
+                )
+            out += [
+                "# HELP yark_viewer_cache_hits_total Archives served from the cache",
+                "# TYPE yark_viewer_cache_hits_total counter",
+                f"yark_viewer_cache_hits_total {self.counters['cache_hits']}",
+                "# HELP yark_viewer_cache_loads_total Archives loaded because they weren't cached or had changed",
+                "# TYPE yark_viewer_cache_loads_total counter",
+                f"yark_viewer_cache_loads_total {self.counters['cache_loads']}",
+                "# HELP yark_viewer_load_seconds Time taken to load archives into the cache",
+                "# TYPE yark_viewer_load_seconds histogram",
+            ]
+            out += self.loads._lines("yark_viewer_load_seconds", "")
+        return "\n".join(out) + "\n"
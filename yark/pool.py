@@ -0,0 +1,27 @@
+"""Pool of strings used whilst loading an archive so text repeated across videos, like description templates, is only kept in memory once"""
+
+from __future__ import annotations
+from typing import Optional
+
+
+class StringPool:
+    """Strings of the titles and descriptions decoded so far whilst loading an archive, where every equal string is shared as one object"""
+
+    __slots__ = ("strings",)
+
+    strings: dict[str, str]
+
+    def __init__(self) -> None:
+        self.strings = {}
+
+    def add(self, string: Optional[str]) -> Optional[str]:
+        """Gets the pooled copy of a string, adding it to the pool if it's new"""
+        if string is None:
+            return None
+        return self.strings.setdefault(string, string)
+
+    def add_text(self, value):
+        """Pools every string in a full text or diff from a text's history"""
+        if value is None or isinstance(value, str):
+            return self.add(value)
+        return [op if isinstance(op, list) else self.add(op) for op in value]
@@ -0,0 +1,70 @@
+"""Recording of downloaded metadata so refreshes can be replayed offline"""
+
+from __future__ import annotations
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+import gzip
+import json
+
+RECORDING_VERSION = 1
+"""Version of the recording format, which is separate to archive versions"""
+
+ENTRY_FIELDS = [
+    "_type",
+    "id",
+    "ie_key",
+    "url",
+    "title",
+    "description",
+    "upload_date",
+    "width",
+    "height",
+    "view_count",
+    "like_count",
+    "thumbnail",
+]
+"""Fields of yt-dlp metadata which yark reads, everything else is left out of recordings"""
+
+
+def record(res: dict[str, Any], url: str, thumbnails: dict[str, str], path: Path):
+    """Saves downloaded metadata for a channel at `url` and the ids of it's `thumbnails` to `path`, compressed and stripped down to what yark reads"""
+    recording = {
+        "version": RECORDING_VERSION,
+        "url": url,
+        "recorded": datetime.utcnow().isoformat(),
+        "metadata": _strip(res),
+        "thumbnails": thumbnails,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(path.name + ".tmp")
+    with gzip.open(temp, "wt", encoding="utf-8") as file:
+        json.dump(recording, file)
+    temp.replace(path)
+
+
+def replay(path: Path) -> tuple[dict[str, Any], dict[str, str]]:
+    """Loads metadata and thumbnail ids recorded with `record` from `path`"""
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        recording = json.load(file)
+    if recording.get("version") != RECORDING_VERSION:
+        raise ValueError(
+            f"Recording is v{recording.get('version')} but only v{RECORDING_VERSION} can be replayed"
+        )
+    return recording["metadata"], recording["thumbnails"]
+
+
+def _strip(res: dict[str, Any]) -> dict[str, Any]:
+    """Strips metadata down to the fields yark reads, keeping nested listings like channel tabs"""
+    stripped = {key: res[key] for key in ENTRY_FIELDS if key in res}
+
+    # Listings of videos or tabs
+    if "entries" in res:
+        stripped["entries"] = [_strip(entry) for entry in res["entries"]]
+
+    # Formats are only checked for being available so one stand-in is enough
+    if "formats" in res:
+        stripped["formats"] = [{"format_id": "recorded"}] if res["formats"] else []
+
+    # Return
+    return stripped
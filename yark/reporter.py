@@ -1,15 +1,34 @@
 """Channel reporting system allowing detailed logging of useful information"""
 
 from colorama import Fore, Style
+from io import StringIO
+from pathlib import Path
+import csv
 import datetime
+import json
 from .video import Video, Element
-from .utils import _truncate_text
-from typing import TYPE_CHECKING, Optional
+from .utils import _file_name, _truncate_text
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Optional
 
 if TYPE_CHECKING:
     from .channel import Channel
 
 
+REPORT_FIELDS = ["channel", "change", "kind", "category", "id", "title", "value"]
+"""Columns of a refresh report exported as csv, where `change` is added, deleted or updated"""
+
+INTERESTING_FIELDS = [
+    "channel",
+    "category",
+    "id",
+    "title",
+    "title_changes",
+    "description_changes",
+    "deleted_changes",
+]
+"""Columns of an interesting changes report exported as csv"""
+
+
 class Reporter:
     channel: "Channel"
     added: list[Video]
@@ -64,83 +83,103 @@ class Reporter:
         self.deleted = []
         self.updated = []
 
-    def interesting_changes(self):
-        """Reports on the most interesting changes for the channel linked to this reporter"""
-
-        def fmt_video(kind: str, video: Video) -> str:
-            """Formats a video if it's interesting, otherwise returns an empty string"""
-            # Skip formatting because it's got nothing of note
-            if (
-                not video.title.changed()
-                and not video.description.changed()
-                and not video.deleted.changed()
-            ):
-                return ""
-
-            # Lambdas for easy buffer addition for next block
-            buf: list[str] = []
-            maybe_capitalize = lambda word: word.capitalize() if len(buf) == 0 else word
-            add_buf = lambda name, change, colour: buf.append(
-                colour + maybe_capitalize(name) + f" x{change}" + Fore.RESET
-            )
-
-            # Figure out how many changes have happened in each category and format them together
-            change_deleted = sum(
-                1 for value in video.deleted.inner.values() if value == True
-            )
-            if change_deleted != 0:
-                add_buf("deleted", change_deleted, Fore.RED)
-            change_description = len(video.description.inner) - 1
-            if change_description != 0:
-                add_buf("description", change_description, Fore.CYAN)
-            change_title = len(video.title.inner) - 1
-            if change_title != 0:
-                add_buf("title", change_title, Fore.CYAN)
-
-            # Combine the detected changes together and capitalize
-            changes = ", ".join(buf) + Fore.RESET
-
-            # Truncate title, get viewer link, and format all together with viewer link
-            title = _truncate_text(video.title.current(), 51).strip()
-            url = f"http://127.0.0.1:7667/channel/{video.channel}/{kind}/{video.id}"
-            return (
-                f"  • {title}\n    {changes}\n    "
-                + Style.DIM
-                + url
-                + Style.RESET_ALL
-                + "\n"
-            )
-
-        def fmt_category(kind: str, videos: list) -> Optional[str]:
-            """Returns formatted string for an entire category of `videos` inputted or returns nothing"""
-            # Add interesting videos to buffer
-            HEADING = f"Interesting {kind}:\n"
-            buf = HEADING
+    def rows(self) -> Iterator[dict[str, Any]]:
+        """Generates a row for each video which was updated, added or deleted in the last refresh"""
+        channel = str(self.channel)
+        categories = {
+            video.id: category
+            for category in ["shorts", "livestreams", "videos"]
+            for video in getattr(self.channel, category)
+        }
+        for kind, element in self.updated:
+            value = element.current()
+            yield {
+                "channel": channel,
+                "change": "updated",
+                "kind": kind,
+                "category": categories.get(element.video.id),
+                "id": element.video.id,
+                "title": element.video.title.current(),
+                "value": (
+                    value._to_element() if hasattr(value, "_to_element") else value
+                ),
+            }
+        for change, videos in [("added", self.added), ("deleted", self.deleted)]:
             for video in videos:
-                buf += fmt_video(kind, video)
-
-            # Return depending on if the buf is just the heading
-            return None if buf == HEADING else buf[:-1]
-
+                yield {
+                    "channel": channel,
+                    "change": change,
+                    "kind": None,
+                    "category": categories.get(video.id),
+                    "id": video.id,
+                    "title": video.title.current(),
+                    "value": None,
+                }
+
+    def interesting_rows(
+        self, since: Optional[datetime.datetime] = None
+    ) -> Iterator[dict[str, Any]]:
+        """Generates a row for each video with interesting changes, only counting those made after `since` if it's given"""
+        channel = str(self.channel)
+        for category, video, changed in self._interesting(since):
+            yield {
+                "channel": channel,
+                "category": category,
+                "id": video.id,
+                "title": video.title.current(),
+                "title_changes": changed["title"],
+                "description_changes": changed["description"],
+                "deleted_changes": changed["deleted"],
+            }
+
+    def export(self, path: Path, name: Optional[str] = None):
+        """Writes the refresh report to `path` as csv if it ends in `.csv` and as json lines otherwise, or into `[name]-report.ndjson` if it's a directory, where `name` defaults to the channel's name"""
+        if path.is_dir():
+            name = str(self.channel) if name is None else name
+            path = path / f"{_file_name(name)}-report.ndjson"
+        with open(path, "w+", newline="") as file:
+            lines = (
+                _csv_lines(self.rows(), REPORT_FIELDS)
+                if path.suffix == ".csv"
+                else _ndjson_lines(self.rows())
+            )
+            for line in lines:
+                file.write(line)
+
+    def _interesting(
+        self, since: Optional[datetime.datetime]
+    ) -> Iterator[tuple[str, Video, dict[str, int]]]:
+        """Goes through every video which has had changes, using their counted changes so histories aren't decoded"""
+        for category in ["videos", "livestreams", "shorts"]:
+            for video in getattr(self.channel, category):
+                changed = video.changed_since(since)
+                if any(changed.values()):
+                    yield category, video, changed
+
+    def interesting_changes(self, since: Optional[datetime.datetime] = None):
+        """Reports on the most interesting changes for the channel linked to this reporter, only counting those made after `since` if it's given"""
         # Tell users whats happening
-        print(f"Finding interesting changes in {self.channel}..")
-
-        # Get reports on the three categories
-        categories = [
-            ("videos", fmt_category("videos", self.channel.videos)),
-            ("livestreams", fmt_category("livestreams", self.channel.livestreams)),
-            ("shorts", fmt_category("shorts", self.channel.shorts)),
-        ]
+        if since is None:
+            print(f"Finding interesting changes in {self.channel}..")
+        else:
+            print(
+                f"Finding interesting changes in {self.channel} since {since.isoformat()}.."
+            )
 
-        # Combine those with nothing of note and print out interesting
-        not_of_note = []
-        for name, buf in categories:
-            if buf is None:
-                not_of_note.append(name)
-            else:
-                print(buf)
+        # Print interesting videos as they're found under a heading for their category
+        found = []
+        for category, video, changed in self._interesting(since):
+            if category not in found:
+                found.append(category)
+                print(f"Interesting {category}:")
+            print(_fmt_interesting(category, video, changed))
 
         # Print out those with nothing of note at the end
+        not_of_note = [
+            category
+            for category in ["videos", "livestreams", "shorts"]
+            if category not in found
+        ]
         if len(not_of_note) != 0:
             not_of_note = "/".join(not_of_note)
             print(f"No interesting {not_of_note} found")
@@ -149,6 +188,45 @@ class Reporter:
         print(_watermark())
 
 
+def _fmt_interesting(category: str, video: Video, changed: dict[str, int]) -> str:
+    """Formats a video with interesting changes along with how many of each kind it's had"""
+    # Figure out how many changes have happened in each category and format them together
+    buf: list[str] = []
+    for name, colour in [
+        ("deleted", Fore.RED),
+        ("description", Fore.CYAN),
+        ("title", Fore.CYAN),
+    ]:
+        if changed[name] != 0:
+            label = name.capitalize() if len(buf) == 0 else name
+            buf.append(colour + label + f" x{changed[name]}" + Fore.RESET)
+    changes = ", ".join(buf) + Fore.RESET
+
+    # Truncate title, get viewer link, and format all together with viewer link
+    title = _truncate_text(video.title.current(), 51).strip()
+    url = f"http://127.0.0.1:7667/channel/{video.channel}/{category}/{video.id}"
+    return f"  • {title}\n    {changes}\n    " + Style.DIM + url + Style.RESET_ALL
+
+
+def _ndjson_lines(rows: Iterable[dict[str, Any]]) -> Iterator[str]:
+    """Generates a line of json for each row"""
+    for row in rows:
+        yield json.dumps(row) + "\n"
+
+
+def _csv_lines(rows: Iterable[dict[str, Any]], fields: list[str]) -> Iterator[str]:
+    """Generates a csv header and then a line for each row, reusing one small buffer"""
+    buf = StringIO()
+    writer = csv.DictWriter(buf, fields)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    yield buf.getvalue()
+
+
 def _watermark() -> str:
     """Returns a new watermark with a Yark timestamp"""
     date = datetime.datetime.utcnow().isoformat()
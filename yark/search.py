@@ -0,0 +1,255 @@
+"""Full-text search over titles, descriptions and notes using an inverted index stored beside the archive"""
+
+from __future__ import annotations
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
+import math
+import re
+import sqlite3
+
+if TYPE_CHECKING:
+    from .channel import Channel
+    from .video import Video, Note
+
+FIELD_WEIGHTS = {"title": 3.0, "description": 1.0, "note": 2.0}
+"""How much a word appearing in each field counts towards a video's score"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS videos (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    video TEXT NOT NULL,
+    field TEXT NOT NULL,
+    source TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (term, video, field, source)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_source ON postings (source);
+"""
+"""Tables of the index, where the `source` of a posting is the note it came from or empty for titles and descriptions"""
+
+_TOKEN = re.compile(r"\w+")
+
+_SCORE_TERM = (
+    "SELECT video, SUM(count * CASE field "
+    + " ".join(
+        f"WHEN '{field}' THEN {weight}" for field, weight in FIELD_WEIGHTS.items()
+    )
+    + " END) FROM postings WHERE term = ? GROUP BY video"
+)
+"""Weighted count of a word in each video it's in"""
+
+_BATCH = 500
+"""Videos looked up at once when checking if they have a word, keeping under sqlite's limit of parameters"""
+
+_UPSERT_POSTING = "INSERT INTO postings VALUES (?, ?, ?, ?, ?) ON CONFLICT (term, video, field, source) DO UPDATE SET count = max(count, excluded.count)"
+"""Adds a posting, keeping the highest count so words of an old title aren't counted twice when it's changed back"""
+
+
+class SearchHit:
+    """Video matching a search, with the title it currently has and how well it matched"""
+
+    __slots__ = ("id", "title", "score")
+
+    id: str
+    title: str
+    score: float
+
+    def __init__(self, id: str, title: str, score: float) -> None:
+        self.id = id
+        self.title = title
+        self.score = score
+
+
+class SearchIndex:
+    """Inverted index of every word that's ever been in a video's title, description or notes, stored as `yark.search.sqlite`"""
+
+    path: Path
+    pending: list[tuple[str, str, str, Optional[str]]]
+    titles: dict[str, str]
+
+    def __init__(self, path: Path) -> None:
+        self.path = path / "yark.search.sqlite"
+        self.pending = []
+        self.titles = {}
+
+    def built(self) -> bool:
+        """Checks if the index has been built for the archive yet"""
+        if not self.path.exists():
+            return False
+        with self._connect() as conn:
+            return (
+                conn.execute("SELECT 1 FROM meta WHERE key = 'built'").fetchone()
+                is not None
+            )
+
+    def add(self, video: Video, field: str, text: Optional[str]):
+        """Queues the words of a new `title` or `description` of `video` to be indexed on the next save, keeping the words of it's old ones"""
+        self.pending.append((video.id, field, "", text))
+        if field == "title" and text is not None:
+            self.titles[video.id] = text
+
+    def note(self, op: str, note: Note):
+        """Indexes a note being added, updated or deleted (the `op`) straight away"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM postings WHERE source = ?", (note.id,))
+            if op != "delete":
+                conn.executemany(
+                    "INSERT OR REPLACE INTO postings VALUES (?, ?, 'note', ?, ?)",
+                    [
+                        (term, note.video.id, note.id, count)
+                        for term, count in _terms(_note_text(note)).items()
+                    ],
+                )
+
+    def save(self):
+        """Writes queued titles and descriptions to the index in one transaction"""
+        if len(self.pending) == 0:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                _UPSERT_POSTING,
+                _postings(self.pending),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO videos VALUES (?, ?)", self.titles.items()
+            )
+        self.pending = []
+        self.titles = {}
+
+    def rebuild(self, channel: Channel):
+        """Indexes every past and current title, description and note in `channel` from scratch"""
+        # Gather everything
+        queued = []
+        titles = {}
+        for videos in [channel.videos, channel.livestreams, channel.shorts]:
+            for video in videos:
+                for field in ["title", "description"]:
+                    for text in getattr(video, field).inner.values():
+                        queued.append((video.id, field, "", text))
+                titles[video.id] = video.title.current()
+                for note in video.notes:
+                    queued.append((video.id, "note", note.id, _note_text(note)))
+
+        # Replace index with it
+        with self._connect() as conn:
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM videos")
+            conn.executemany(
+                _UPSERT_POSTING,
+                _postings(queued),
+            )
+            conn.executemany("INSERT INTO videos VALUES (?, ?)", titles.items())
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('built', '1')")
+        self.pending = []
+        self.titles = {}
+
+    def query(self, text: str, limit: int = 20) -> list[SearchHit]:
+        """Finds videos with every word of `text` in them, best matches first, without needing the archive to be loaded"""
+        terms = list(dict.fromkeys(_tokenize(text)))
+        if len(terms) == 0:
+            return []
+        with self._connect() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+            # Go through the rarest words first so there's few videos left to check for common ones
+            found = {
+                term: conn.execute(
+                    "SELECT COUNT(DISTINCT video) FROM postings WHERE term = ?",
+                    (term,),
+                ).fetchone()[0]
+                for term in terms
+            }
+            if 0 in found.values():
+                return []
+            terms.sort(key=lambda term: found[term])
+
+            # Score each video for each word, only keeping videos which have all of them so far
+            scores: Optional[dict[str, float]] = None
+            for term in terms:
+                idf = math.log(1 + total / found[term])
+                if scores is None and len(terms) == 1:
+                    rows = conn.execute(
+                        _SCORE_TERM + " ORDER BY 2 DESC, video LIMIT ?", (term, limit)
+                    ).fetchall()
+                    scores = {video: score * idf for video, score in rows}
+                elif scores is None:
+                    rows = conn.execute(_SCORE_TERM, (term,)).fetchall()
+                    scores = {video: score * idf for video, score in rows}
+                else:
+                    candidates = list(scores)
+                    matched = {}
+                    for ind in range(0, len(candidates), _BATCH):
+                        batch = candidates[ind : ind + _BATCH]
+                        rows = conn.execute(
+                            _SCORE_TERM.replace(
+                                "term = ?",
+                                f"term = ? AND video IN ({','.join('?' * len(batch))})",
+                            ),
+                            [term] + batch,
+                        ).fetchall()
+                        for video, score in rows:
+                            matched[video] = scores[video] + score * idf
+                    scores = matched
+                if len(scores) == 0:
+                    return []
+
+            # Get titles of the best matches
+            best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            hits = []
+            for video, score in best:
+                row = conn.execute(
+                    "SELECT title FROM videos WHERE id = ?", (video,)
+                ).fetchone()
+                hits.append(SearchHit(video, row[0] if row else "", round(score, 3)))
+
+        # Return
+        return hits
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Opens a connection to the index for one transaction, so each of the viewer's threads gets it's own"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.executescript(SCHEMA)
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+def _tokenize(text: Optional[str]) -> list[str]:
+    """Splits text into lowercase words, skipping single letters but not numbers"""
+    if text is None:
+        return []
+    return [
+        word for word in _TOKEN.findall(text.lower()) if len(word) > 1 or word.isdigit()
+    ]
+
+
+def _terms(text: Optional[str]) -> Counter:
+    """Counts how many times each word appears in some text"""
+    return Counter(_tokenize(text))
+
+
+def _note_text(note: Note) -> str:
+    """Gets all searchable text of a note"""
+    return note.title if note.body is None else f"{note.title}\n{note.body}"
+
+
+def _postings(
+    queued: list[tuple[str, str, str, Optional[str]]],
+) -> Iterator[tuple[str, str, str, str, int]]:
+    """Converts queued text of videos into rows of postings"""
+    for video, field, source, text in queued:
+        for term, count in _terms(text).items():
+            yield term, video, field, source, count
@@ -1,8 +1,27 @@
 """Useful shared utility functions"""
 
+from pathlib import Path
+
 
 def _truncate_text(text: str, to: int = 31) -> str:
     """Truncates inputted `text` to ~32 length, adding ellipsis at the end if overflowing"""
     if len(text) > to:
         text = text[: to - 2].strip() + ".."
     return text.ljust(to)
+
+
+def _stamp(path: Path) -> tuple:
+    """Gets modification times and sizes of an archive's files so we can tell when it's changed"""
+    stamp = []
+    for file in ["yark.json", "yark.sqlite", "yark.journal"]:
+        try:
+            stat = (path / file).stat()
+            stamp.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def _file_name(name: str) -> str:
+    """Escapes an archive's name, which can be a path relative to a batch's root, so it's usable as part of a single file name"""
+    return name.replace("%", "%25").replace("/", "%2F")
@@ -1,33 +1,87 @@
 """Single video inside of a channel, allowing reporting and addition/updates to it's status using timestamps"""
 
 from __future__ import annotations
-from datetime import datetime
+from array import array
+from bisect import bisect, bisect_left, insort
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
 from fnmatch import fnmatch
+from operator import le, sub
 from pathlib import Path
 from uuid import uuid4
+import re
 import requests
-import hashlib
 from .errors import NoteNotFoundException
 from .utils import _truncate_text
-from typing import TYPE_CHECKING, Any, Optional
+from typing import TYPE_CHECKING, Any, Iterator, Optional
 
 if TYPE_CHECKING:
     from .channel import Channel
 
 
+class _Lazy:
+    """Video attribute which is only decoded from the video's encoded dictionary the first time it's accessed"""
+
+    def __init__(self, decode) -> None:
+        self.decode = decode
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+        self.attr = f"_{name}"
+
+    def __get__(self, video, owner=None) -> Any:
+        # Accessed on the class itself
+        if video is None:
+            return self
+
+        # Decode if we haven't already
+        try:
+            return getattr(video, self.attr)
+        except AttributeError:
+            value = self.decode(video._encoded[self.name], video)
+            setattr(video, self.attr, value)
+            return value
+
+    def __set__(self, video, value):
+        setattr(video, self.attr, value)
+
+
 class Video:
+    __slots__ = (
+        "channel",
+        "id",
+        "uploaded",
+        "width",
+        "height",
+        "_title",
+        "_description",
+        "_views",
+        "_likes",
+        "_thumbnail",
+        "_deleted",
+        "_notes",
+        "_encoded",
+        "changes",
+        "known_not_deleted",
+    )
+
     channel: "Channel"
     id: str
     uploaded: datetime
     width: int
     height: int
-    title: "Element"
-    description: "Element"
-    views: "Element"
-    likes: "Element"
-    thumbnail: "Element"
-    deleted: "Element"
-    notes: list["Note"]
+    title = _Lazy(lambda encoded, video: Text._from_dict(encoded, video))
+    description = _Lazy(lambda encoded, video: Text._from_dict(encoded, video))
+    views = _Lazy(lambda encoded, video: Counter._from_dict(encoded, video))
+    likes = _Lazy(lambda encoded, video: Counter._from_dict(encoded, video))
+    thumbnail = _Lazy(lambda encoded, video: Thumbnail._from_element(encoded, video))
+    deleted = _Lazy(lambda encoded, video: Element._from_dict(encoded, video))
+    notes = _Lazy(
+        lambda encoded, video: [Note._from_dict(video, note) for note in encoded]
+    )
+    _encoded: Optional[dict]
+    changes: dict[str, list[str]]
 
     @staticmethod
     def new(entry: dict[str, Any], channel) -> Video:
@@ -39,15 +93,21 @@ class Video:
         video.uploaded = _decode_date_yt(entry["upload_date"])
         video.width = entry["width"]
         video.height = entry["height"]
-        video.title = Element.new(video, entry["title"])
-        video.description = Element.new(video, entry["description"])
-        video.views = Element.new(video, entry["view_count"])
-        video.likes = Element.new(
+        video.title = Text.new(video, entry["title"])
+        video.description = Text.new(video, entry["description"])
+        video.views = Counter.new(video, entry["view_count"])
+        video.likes = Counter.new(
             video, entry["like_count"] if "like_count" in entry else None
         )
         video.thumbnail = Element.new(video, Thumbnail.new(entry["thumbnail"], video))
         video.deleted = Element.new(video, False)
         video.notes = []
+        video._encoded = None
+        video.changes = {kind: [] for kind in CHANGE_KINDS}
+
+        # Search
+        channel.search_index.add(video, "title", entry["title"])
+        channel.search_index.add(video, "description", entry["description"])
 
         # Runtime-only
         video.known_not_deleted = True
@@ -69,7 +129,14 @@ class Video:
         self.likes.update(
             "like count", entry["like_count"] if "like_count" in entry else None
         )
-        self.thumbnail.update("thumbnail", Thumbnail.new(entry["thumbnail"], self))
+
+        # Thumbnail, keeping the current one if the new one couldn't be fetched
+        try:
+            self.thumbnail.update("thumbnail", Thumbnail.new(entry["thumbnail"], self))
+        except requests.RequestException:
+            pass
+
+        # Deleted status
         self.deleted.update("undeleted", False)
 
         # Runtime-only
@@ -77,15 +144,11 @@ class Video:
 
     def filename(self) -> Optional[str]:
         """Returns the filename for the downloaded video, if any"""
-        videos = self.channel.path / "videos"
-        for file in videos.iterdir():
-            if file.stem == self.id and file.suffix != ".part":
-                return file.name
-        return None
+        return self.channel.files().get(self.id)
 
     def downloaded(self) -> bool:
         """Checks if this video has been downloaded"""
-        return self.filename() is not None
+        return self.id in self.channel.files()
 
     def updated(self) -> bool:
         """Checks if this video's title or description or deleted status have been ever updated"""
@@ -108,8 +171,8 @@ class Video:
         return f"https://www.youtube.com/watch?v={self.id}"
 
     @staticmethod
-    def _from_dict(encoded: dict, channel) -> Video:
-        """Converts id and encoded dictionary to video for loading a channel"""
+    def _from_dict(encoded: dict, channel, lazy: bool = False) -> Video:
+        """Converts id and encoded dictionary to video for loading a channel, leaving elements and notes to be decoded when they're first used if `lazy`"""
         # Normal
         video = Video()
         video.channel = channel
@@ -117,13 +180,14 @@ class Video:
         video.uploaded = datetime.fromisoformat(encoded["uploaded"])
         video.width = encoded["width"]
         video.height = encoded["height"]
-        video.title = Element._from_dict(encoded["title"], video)
-        video.description = Element._from_dict(encoded["description"], video)
-        video.views = Element._from_dict(encoded["views"], video)
-        video.likes = Element._from_dict(encoded["likes"], video)
-        video.thumbnail = Thumbnail._from_element(encoded["thumbnail"], video)
-        video.notes = [Note._from_dict(video, note) for note in encoded["notes"]]
-        video.deleted = Element._from_dict(encoded["deleted"], video)
+        video._encoded = encoded
+        video.changes = encoded["changes"]
+
+        # Decode everything now if we're not being lazy
+        if not lazy:
+            for name in LAZY_ATTRIBUTES:
+                getattr(video, name)
+            video._encoded = None
 
         # Runtime-only
         video.known_not_deleted = False
@@ -132,20 +196,41 @@ class Video:
         return video
 
     def _to_dict(self) -> dict:
-        """Converts video information to dictionary for committing, doesn't include id"""
-        return {
+        """Converts video information to dictionary for committing, reusing the encoded form of anything which was never decoded"""
+        encoded = {
             "id": self.id,
             "uploaded": self.uploaded.isoformat(),
             "width": self.width,
             "height": self.height,
-            "title": self.title._to_dict(),
-            "description": self.description._to_dict(),
-            "views": self.views._to_dict(),
-            "likes": self.likes._to_dict(),
-            "thumbnail": self.thumbnail._to_dict(),
-            "deleted": self.deleted._to_dict(),
-            "notes": [note._to_dict() for note in self.notes],
         }
+        for name in LAZY_ATTRIBUTES:
+            # Never decoded so it can't have changed
+            if not hasattr(self, f"_{name}"):
+                encoded[name] = self._encoded[name]
+
+            # Notes
+            elif name == "notes":
+                encoded[name] = [note._to_dict() for note in self.notes]
+
+            # Elements
+            else:
+                encoded[name] = getattr(self, name)._to_dict()
+        encoded["changes"] = self.changes
+        return encoded
+
+    def changed_since(self, since: Optional[datetime] = None) -> dict[str, int]:
+        """Counts title, description and deleted changes made after `since` or ever, without decoding any history"""
+        if since is None:
+            return {kind: len(dates) for kind, dates in self.changes.items()}
+        cutoff = since.isoformat()
+        return {
+            kind: len(dates) - bisect(dates, cutoff)
+            for kind, dates in self.changes.items()
+        }
+
+    def _add_change(self, kind: str, date: datetime):
+        """Counts a change to the title or description or the video being deleted, for reports"""
+        insort(self.changes[kind], date.isoformat())
 
     def __repr__(self) -> str:
         # Title
@@ -169,6 +254,21 @@ class Video:
         return self.uploaded < other.uploaded
 
 
+CHANGE_KINDS = ["title", "description", "deleted"]
+"""Kinds of changes which are counted for each video so reports don't need to decode their histories"""
+
+LAZY_ATTRIBUTES = [
+    "title",
+    "description",
+    "views",
+    "likes",
+    "thumbnail",
+    "deleted",
+    "notes",
+]
+"""Attributes of a video which can be lazily decoded, in the order they're encoded"""
+
+
 def _decode_date_yt(input: str) -> datetime:
     """Decodes date from YouTube like `20180915` for example"""
     return datetime.strptime(input, "%Y%m%d")
@@ -197,17 +297,28 @@ def _magnitude(count: Optional[int] = None) -> str:
 
 
 class Element:
+    """Timestamped history of a value, with it's timestamps packed into an array of epoch microseconds beside a list of values"""
+
+    __slots__ = ("video", "_dates", "_values")
+
     video: Video
-    inner: dict[datetime, Any]
+    _dates: array
+    _values: list
 
     @staticmethod
     def new(video: Video, data):
         """Creates new element attached to a video with some initial data"""
         element = Element()
         element.video = video
-        element.inner = {datetime.utcnow(): data}
+        element._dates = array("q", [_encode_epoch(datetime.utcnow())])
+        element._values = [data]
         return element
 
+    @property
+    def inner(self) -> History:
+        """Mapping of timestamps to values in the order they were recorded, acting like a `dict[datetime, Any]`"""
+        return History(self)
+
     def update(self, kind: Optional[str], data):
         """Updates element if it needs to be and returns self, reports change unless `kind` is none"""
         # Check if updating is needed
@@ -215,22 +326,39 @@ class Element:
         current = self.current()
         if (not has_id and current != data) or (has_id and data.id != current.id):
             # Update
-            self.inner[datetime.utcnow()] = data
+            date = datetime.utcnow()
+            self.inner[date] = data
+
+            # Count title and description changes for reports, deletions are counted by whoever marks them
+            if kind in ["title", "description"]:
+                self.video._add_change(kind, date)
 
             # Report if wanted
             if kind is not None:
                 self.video.channel.reporter.add_updated(kind, self)
 
+            # Search new titles and descriptions
+            if kind in ["title", "description"]:
+                self.video.channel.search_index.add(self.video, kind, data)
+
         # Return self
         return self
 
     def current(self):
         """Returns most recent element"""
-        return self.inner[list(self.inner.keys())[-1]]
+        return self._values[-1]
+
+    def first_date(self) -> datetime:
+        """Returns when the first value was recorded"""
+        return _decode_epoch(self._dates[0])
+
+    def last_date(self) -> datetime:
+        """Returns when the most recent value was recorded"""
+        return _decode_epoch(self._dates[-1])
 
     def changed(self) -> bool:
         """Checks if the value has ever been modified from it's original state"""
-        return len(self.inner) > 1
+        return len(self._values) > 1
 
     @staticmethod
     def _from_dict(encoded: dict, video: Video) -> Element:
@@ -238,12 +366,12 @@ class Element:
         # Basics
         element = Element()
         element.video = video
-        element.inner = {}
-
-        # Inner elements
-        for key in encoded:
-            date = datetime.fromisoformat(key)
-            element.inner[date] = encoded[key]
+        element._dates = array(
+            "q", [_encode_epoch(datetime.fromisoformat(key)) for key in encoded]
+        )
+        element._values = list(encoded.values())
+        if not _is_sorted(element._dates):
+            element._sort()
 
         # Return
         return element
@@ -252,43 +380,413 @@ class Element:
         """Converts element to dictionary for committing"""
         # Convert each item
         encoded = {}
-        for date in self.inner:
+        for ind, date in enumerate(self._dates):
             # Convert element value if method available to support custom
-            data = self.inner[date]
+            data = self._get(ind)
             data = data._to_element() if hasattr(data, "_to_element") else data
 
             # Add encoded data to iso-formatted string date
-            encoded[date.isoformat()] = data
+            encoded[_decode_epoch(date).isoformat()] = data
 
         # Return
         return encoded
 
+    def _get(self, ind: int):
+        """Gets value at an index of the history"""
+        return self._values[ind]
+
+    def _set(self, ind: int, data):
+        """Replaces value at an index of the history"""
+        self._values[ind] = data
+
+    def _insert(self, ind: int, data):
+        """Inserts value at an index of the history, it's date should already be inserted"""
+        self._values.insert(ind, data)
+
+    def _delete(self, ind: int):
+        """Deletes value at an index of the history, it's date should already be deleted"""
+        del self._values[ind]
+
+    def _sort(self):
+        """Sorts history by date if it was saved out of order, like when the clock went backwards, so it can always be bisected"""
+        order = sorted(range(len(self._dates)), key=self._dates.__getitem__)
+        self._dates = array("q", [self._dates[ind] for ind in order])
+        values = [self._values[ind] for ind in order]
+        self._values = array("q", values) if isinstance(self._values, array) else values
+
+
+class Counter(Element):
+    """Element for counts like views and likes, storing it's values in a typed array with a sentinel for missing counts"""
+
+    __slots__ = ()
+
+    @staticmethod
+    def new(video: Video, data) -> Counter:
+        """Creates new counter attached to a video with an initial count"""
+        element = Counter()
+        element.video = video
+        element._dates = array("q", [_encode_epoch(datetime.utcnow())])
+        element._values = array("q", [_encode_count(data)])
+        return element
+
+    def current(self) -> Optional[int]:
+        """Returns most recent count"""
+        return _decode_count(self._values[-1])
+
+    def at(self, date: datetime) -> Optional[int]:
+        """Returns count as it was at `date`, or none if it wasn't known yet"""
+        ind = bisect(self._dates, _encode_epoch(date))
+        return None if ind == 0 else _decode_count(self._values[ind - 1])
+
+    def growth(
+        self, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> Optional[int]:
+        """Returns how much the count grew between `start` and `end`, defaulting to the first and latest counts"""
+        first = self._get(0) if start is None else self.at(start)
+        last = self.current() if end is None else self.at(end)
+        return None if first is None or last is None else last - first
+
+    def deltas(self) -> array:
+        """Returns changes between each pair of consecutive known counts"""
+        known = array("q", filter(COUNT_MISSING.__ne__, self._values))
+        return array("q", map(sub, known[1:], known))
+
+    def downsample(
+        self,
+        points: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> list[tuple[datetime, int]]:
+        """Returns at most `points` known counts between `start` and `end` which keep the shape of the history, for charting"""
+        # Cut out the window
+        lo = 0 if start is None else bisect_left(self._dates, _encode_epoch(start))
+        hi = (
+            len(self._dates) if end is None else bisect(self._dates, _encode_epoch(end))
+        )
+        series = [
+            (self._dates[ind], self._values[ind])
+            for ind in range(lo, hi)
+            if self._values[ind] != COUNT_MISSING
+        ]
+
+        # Downsample and decode dates
+        return [(_decode_epoch(date), value) for date, value in _lttb(series, points)]
+
+    def columns(self) -> tuple[array, array]:
+        """Returns the raw arrays of epoch microsecond dates and counts, which can be wrapped by libraries like numpy without copying"""
+        return self._dates, self._values
+
+    @staticmethod
+    def _from_dict(encoded: dict, video: Video) -> Counter:
+        """Converts encoded dictionary into counter"""
+        element = Counter()
+        element.video = video
+        element._dates = array(
+            "q", [_encode_epoch(datetime.fromisoformat(key)) for key in encoded]
+        )
+        element._values = array("q", map(_encode_count, encoded.values()))
+        if not _is_sorted(element._dates):
+            element._sort()
+        return element
+
+    def _get(self, ind: int) -> Optional[int]:
+        return _decode_count(self._values[ind])
+
+    def _set(self, ind: int, data):
+        self._values[ind] = _encode_count(data)
+
+    def _insert(self, ind: int, data):
+        self._values.insert(ind, _encode_count(data))
+
+
+COUNT_MISSING = -(2**63)
+"""Sentinel stored in counters when a count wasn't available, like when likes are hidden"""
+
+
+def _lttb(series: list[tuple[int, int]], points: int) -> list[tuple[int, int]]:
+    """Downsamples series of points to `points` of them using largest-triangle-three-buckets, always keeping the first and last"""
+    # Nothing to drop
+    if len(series) <= points:
+        return series
+    if points < 3:
+        return [series[0], series[-1]][:points]
+
+    # Pick the point from each bucket which makes the largest triangle with the last pick and the next bucket's average
+    sampled = [series[0]]
+    every = (len(series) - 2) / (points - 2)
+    picked = 0
+    for bucket in range(points - 2):
+        # Average of the next bucket
+        next_start = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, len(series))
+        next_len = next_end - next_start
+        avg_x = sum(series[ind][0] for ind in range(next_start, next_end)) / next_len
+        avg_y = sum(series[ind][1] for ind in range(next_start, next_end)) / next_len
+
+        # Largest triangle in this bucket
+        ax, ay = series[picked]
+        largest = -1.0
+        for ind in range(int(bucket * every) + 1, next_start):
+            x, y = series[ind]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > largest:
+                largest = area
+                picked = ind
+        sampled.append(series[picked])
+
+    # Return with the last point
+    sampled.append(series[-1])
+    return sampled
+
+
+def _encode_count(count: Optional[int]) -> int:
+    """Encodes a count for storing in a counter's array"""
+    return COUNT_MISSING if count is None else int(count)
+
+
+def _decode_count(count: int) -> Optional[int]:
+    """Decodes a count stored in a counter's array"""
+    return None if count == COUNT_MISSING else count
+
+
+class Text(Element):
+    """Element for titles and descriptions, storing it's history as full values every so often with compact diffs from the previous value in between"""
+
+    __slots__ = ("_current",)
+
+    _current: Optional[str]
+
+    @staticmethod
+    def new(video: Video, data) -> Text:
+        """Creates new text attached to a video with some initial text"""
+        element = Text()
+        element.video = video
+        element._dates = array("q", [_encode_epoch(datetime.utcnow())])
+        element._current = data
+        element._values = [element._current]
+        return element
+
+    def current(self) -> Optional[str]:
+        """Returns most recent text without having to rebuild it from diffs"""
+        return self._current
+
+    @staticmethod
+    def _from_dict(encoded: dict, video: Video) -> Text:
+        """Converts encoded dictionary of full values and diffs into text, sharing it's strings with the rest of the archive if it's being loaded all at once"""
+        # Basics
+        element = Text()
+        element.video = video
+        element._dates = array(
+            "q", [_encode_epoch(datetime.fromisoformat(key)) for key in encoded]
+        )
+        element._values = list(encoded.values())
+        element._current = element._rebuild(len(element._values) - 1)
+        if not _is_sorted(element._dates):
+            element._sort()
+
+        # Share strings with texts decoded before it
+        strings = video.channel.strings
+        if strings is not None:
+            element._values = [strings.add_text(value) for value in element._values]
+            element._current = strings.add(element._current)
+
+        # Return
+        return element
+
+    def _to_dict(self) -> dict:
+        """Converts text to dictionary for committing, keeping it's diffs as they are"""
+        return {
+            _decode_epoch(date).isoformat(): value
+            for date, value in zip(self._dates, self._values)
+        }
+
+    def _get(self, ind: int) -> Optional[str]:
+        if ind == len(self._values) - 1:
+            return self._current
+        return self._rebuild(ind)
+
+    def _set(self, ind: int, data):
+        values = [self._rebuild(i) for i in range(len(self._values))]
+        values[ind] = data
+        self._reencode(values)
+
+    def _insert(self, ind: int, data):
+        # Newest text is diffed from the current one, which is nearly always the case
+        if ind == len(self._values):
+            self._values.append(_encode_text(ind, self._current, data))
+            self._current = data
+            return
+
+        # Older text changes every diff after it
+        values = [self._rebuild(i) for i in range(len(self._values))]
+        values.insert(ind, data)
+        self._reencode(values)
+
+    def _delete(self, ind: int):
+        values = [self._rebuild(i) for i in range(len(self._values))]
+        del values[ind]
+        self._reencode(values)
+
+    def _rebuild(self, ind: int) -> Optional[str]:
+        """Rebuilds text at an index of the history by applying diffs from the full value before it"""
+        start = ind
+        while isinstance(self._values[start], list):
+            start -= 1
+        text = self._values[start]
+        for value in self._values[start + 1 : ind + 1]:
+            text = _patch(text, value)
+        return text
+
+    def _sort(self):
+        # Diffs are from the text before them so they're rebuilt in the new order
+        values = [self._rebuild(ind) for ind in range(len(self._values))]
+        order = sorted(range(len(self._dates)), key=self._dates.__getitem__)
+        self._dates = array("q", [self._dates[ind] for ind in order])
+        self._reencode([values[ind] for ind in order])
+
+    def _reencode(self, values: list[Optional[str]]):
+        """Replaces the whole history with freshly encoded full values and diffs"""
+        self._values = [
+            _encode_text(ind, values[ind - 1] if ind > 0 else None, value)
+            for ind, value in enumerate(values)
+        ]
+        self._current = values[-1] if len(values) != 0 else None
+
+
+TEXT_KEYFRAME_INTERVAL = 8
+"""How often a full value is stored in a text's history, so rebuilding an old value never needs more than this many diffs"""
+
+_TEXT_TOKENS = re.compile(r"\s+|\S+")
+"""Words and the whitespace between them, which texts are diffed by"""
+
+
+def _encode_text(ind: int, previous: Optional[str], text: Optional[str]):
+    """Encodes text at an index of a history as a diff from the `previous` text if it's smaller, otherwise as it's full value"""
+    # Full values every so often or when there's nothing to diff
+    if ind % TEXT_KEYFRAME_INTERVAL == 0 or previous is None or text is None:
+        return text
+
+    # Diff as ranges of words to copy from the previous text and new text between them
+    old = _TEXT_TOKENS.findall(previous)
+    new = _TEXT_TOKENS.findall(text)
+    diff: list = []
+    size = 0
+    matcher = SequenceMatcher(None, old, new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            diff.append([i1, i2])
+            size += 8
+        elif j2 > j1:
+            diff.append("".join(new[j1:j2]))
+            size += len(diff[-1]) + 2
+        if size >= len(text):
+            return text
+
+    # Return
+    return diff
+
+
+def _patch(text: str, diff: list) -> str:
+    """Applies a diff made by `_encode_text` to the text before it"""
+    old = _TEXT_TOKENS.findall(text)
+    return "".join(
+        "".join(old[op[0] : op[1]]) if isinstance(op, list) else op for op in diff
+    )
+
+
+class History(MutableMapping):
+    """View of an element's packed history which acts like the `dict[datetime, Any]` elements used to be"""
+
+    __slots__ = ("element",)
+
+    element: Element
+
+    def __init__(self, element: Element) -> None:
+        self.element = element
+
+    def __len__(self) -> int:
+        return len(self.element._values)
+
+    def __iter__(self) -> Iterator[datetime]:
+        return (_decode_epoch(date) for date in self.element._dates)
+
+    def __contains__(self, date) -> bool:
+        return isinstance(date, datetime) and self._find(date) is not None
+
+    def __getitem__(self, date: datetime):
+        ind = self._find(date)
+        if ind is None:
+            raise KeyError(date)
+        return self.element._get(ind)
+
+    def __setitem__(self, date: datetime, data):
+        # Replace existing value
+        ind = self._find(date)
+        if ind is not None:
+            self.element._set(ind, data)
+            return
+
+        # Add to history, which is almost always at the end as it's the newest
+        key = _encode_epoch(date)
+        dates = self.element._dates
+        ind = len(dates) if len(dates) == 0 or key > dates[-1] else bisect(dates, key)
+        dates.insert(ind, key)
+        self.element._insert(ind, data)
+
+    def __delitem__(self, date: datetime):
+        ind = self._find(date)
+        if ind is None:
+            raise KeyError(date)
+        del self.element._dates[ind]
+        self.element._delete(ind)
+
+    def _find(self, date: datetime) -> Optional[int]:
+        """Finds index of `date` in the history if it's there"""
+        # Newer than everything, which is the case for every update
+        key = _encode_epoch(date)
+        dates = self.element._dates
+        if len(dates) == 0 or key > dates[-1]:
+            return None
+
+        # Histories are always sorted when they're decoded so they can be bisected
+        ind = bisect_left(dates, key)
+        return ind if dates[ind] == key else None
+
+
+_EPOCH = datetime(1970, 1, 1)
+"""Start of epoch which element timestamps are packed relative to"""
+
+
+def _is_sorted(dates: array) -> bool:
+    """Checks if packed dates are in order without looping in python"""
+    return all(map(le, dates, dates[1:]))
+
+
+def _encode_epoch(date: datetime) -> int:
+    """Encodes a date as microseconds since the epoch for packing into arrays"""
+    return (date - _EPOCH) // timedelta(microseconds=1)
+
+
+def _decode_epoch(micros: int) -> datetime:
+    """Decodes microseconds since the epoch back into a date"""
+    return _EPOCH + timedelta(microseconds=micros)
+
 
 class Thumbnail:
+    __slots__ = ("video", "id")
+
     video: Video
     id: str
-    path: Path
 
     @staticmethod
     def new(url: str, video: Video):
-        """Pulls a new thumbnail from YouTube and saves"""
+        """Pulls a new thumbnail from YouTube and saves if it's changed"""
         # Details
         thumbnail = Thumbnail()
         thumbnail.video = video
 
-        # Get image and calculate it's hash
-        image = requests.get(url).content
-        thumbnail.id = hashlib.blake2b(
-            image, digest_size=20, usedforsecurity=False
-        ).hexdigest()
-
-        # Calculate paths
-        thumbnails = thumbnail._path()
-        thumbnail.path = thumbnails / f"{thumbnail.id}.webp"
-
-        # Save to collection
-        with open(thumbnail.path, "wb+") as file:
-            file.write(image)
+        # Get image's hash, which is downloaded and saved by the fetcher if needed
+        thumbnail.id = video.channel.fetcher.fetch(url)
 
         # Return
         return thumbnail
@@ -299,9 +797,13 @@ class Thumbnail:
         thumbnail = Thumbnail()
         thumbnail.id = id
         thumbnail.video = video
-        thumbnail.path = thumbnail._path() / f"{thumbnail.id}.webp"
         return thumbnail
 
+    @property
+    def path(self) -> Path:
+        """Path to the saved thumbnail"""
+        return self._path() / f"{self.id}.webp"
+
     def _path(self) -> Path:
         """Gets root path of thumbnail using video's channel path"""
         return self.video.channel.path / "thumbnails"
@@ -310,8 +812,7 @@ class Thumbnail:
     def _from_element(element: dict, video: Video) -> Element:
         """Converts element of thumbnails to properly formed thumbnails"""
         decoded = Element._from_dict(element, video)
-        for date in decoded.inner:
-            decoded.inner[date] = Thumbnail.load(decoded.inner[date], video)
+        decoded._values = [Thumbnail.load(id, video) for id in decoded._values]
         return decoded
 
     def _to_element(self) -> str:
@@ -322,6 +823,8 @@ class Thumbnail:
 class Note:
     """Allows Yark users to add notes to videos"""
 
+    __slots__ = ("video", "id", "timestamp", "title", "body")
+
     video: Video
     id: str
     timestamp: int
@@ -1,7 +1,15 @@
 """Flask-based web viewer for rich history reporting"""
 
+from __future__ import annotations
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from weakref import WeakKeyDictionary
 import json
 import os
+import threading
+import time
 from flask import (
     Flask,
     render_template,
@@ -10,6 +18,9 @@ from flask import (
     url_for,
     send_from_directory,
     Blueprint,
+    current_app,
+    g,
+    Response,
 )
 import logging
 from .errors import (
@@ -19,10 +30,30 @@ from .errors import (
     TimestampException,
 )
 from .channel import Channel
-from .video import Note
+from .metrics import ViewerMetrics
+from .utils import _stamp
+from .video import Video, Note
 
 routes = Blueprint("routes", __name__, template_folder="templates")
 
+MAX_PAGE_SIZE = 500
+"""Largest page of videos which can be requested at once"""
+
+CHART_POINTS = 300
+"""Points sent for a chart of a video's views or likes when the page doesn't ask for a specific amount"""
+
+MAX_CHART_POINTS = 2000
+"""Most points which can be requested for one chart"""
+
+SEARCH_RESULTS = 60
+"""Most videos shown for a search"""
+
+VIDEO_MAX_AGE = 24 * 60 * 60
+"""Seconds browsers can reuse a video for without checking it, they're only replaced if they're downloaded again in another format"""
+
+THUMBNAIL_MAX_AGE = 365 * 24 * 60 * 60
+"""Seconds browsers can cache thumbnails for, they're named by their hash so they never change"""
+
 
 @routes.route("/", methods=["POST", "GET"])
 def index():
@@ -38,7 +69,7 @@ def index():
         if visited is not None:
             visited = json.loads(visited)
         error = request.args["error"] if "error" in request.args else None
-        return render_template("index.html", error=error, visited=visited)
+        return _render("index.html", error=error, visited=visited)
 
 
 @routes.route("/channel/<name>")
@@ -54,10 +85,70 @@ def channel(name, kind):
         return redirect(url_for("routes.index", error="Video kind not recognised"))
 
     try:
-        channel = Channel.load(name)
-        ldir = os.listdir(channel.path / "videos")
-        return render_template(
-            "channel.html", title=name, channel=channel, name=name, ldir=ldir
+        channel = _load(name)
+        videos, next = _page(channel, kind)
+        return _render(
+            "channel.html",
+            title=name,
+            channel=channel,
+            name=name,
+            kind=kind,
+            videos=videos,
+            next=next,
+        )
+    except ArchiveNotFoundException:
+        return redirect(
+            url_for("routes.index", error="Couldn't open channel's archive")
+        )
+    except VideoNotFoundException:
+        return redirect(url_for("routes.channel", name=name, kind=kind))
+    except Exception as e:
+        return redirect(url_for("routes.index", error=f"Internal server error:\n{e}"))
+
+
+@routes.route("/api/channel/<name>/<kind>")
+def channel_page(name, kind):
+    """Page of a channel's videos as json, use the `next` value as `after` to get the next page"""
+    if kind not in ["videos", "livestreams", "shorts"]:
+        return "Video kind not recognised", 404
+
+    try:
+        channel = _load(name)
+        videos, next = _page(channel, kind)
+        return {
+            "videos": [
+                {
+                    "id": video.id,
+                    "title": video.title.current(),
+                    "uploaded": video.uploaded.isoformat(),
+                    "downloaded": video.downloaded(),
+                    "updated": video.updated(),
+                    "thumbnail": video.thumbnail.current().id,
+                }
+                for video in videos
+            ],
+            "next": next,
+        }
+    except ArchiveNotFoundException:
+        return "Couldn't open channel's archive", 404
+    except VideoNotFoundException:
+        return "Couldn't find video to get page after", 404
+
+
+@routes.route("/channel/<name>/search")
+def search(name):
+    """Videos with every word of the `q` arg in their past or present titles, descriptions or notes"""
+    try:
+        channel = _load(name)
+        query = request.args.get("q", "")
+        return _render(
+            "search.html",
+            title=f"Search · {name}",
+            name=name,
+            query=query,
+            results=[
+                (video, _kind(channel, video)) for video in _search(channel, query)
+            ],
         )
     except ArchiveNotFoundException:
         return redirect(
@@ -67,6 +158,28 @@ def channel(name, kind):
         return redirect(url_for("routes.index", error=f"Internal server error:\n{e}"))
 
 
+@routes.route("/api/channel/<name>/search")
+def search_api(name):
+    """Search results for the `q` arg as json, best matches first"""
+    try:
+        channel = _load(name)
+        return {
+            "videos": [
+                {
+                    "id": video.id,
+                    "kind": _kind(channel, video),
+                    "title": video.title.current(),
+                    "uploaded": video.uploaded.isoformat(),
+                    "downloaded": video.downloaded(),
+                    "thumbnail": video.thumbnail.current().id,
+                }
+                for video in _search(channel, request.args.get("q", ""))
+            ]
+        }
+    except ArchiveNotFoundException:
+        return "Couldn't open channel's archive", 404
+
+
 @routes.route("/channel/<name>/<kind>/<id>", methods=["GET", "POST", "PATCH", "DELETE"])
 def video(name, kind, id):
     """Detailed video information and viewer"""
@@ -77,21 +190,19 @@ def video(name, kind, id):
 
     try:
         # Get information
-        channel = Channel.load(name)
+        channel = _load(name)
         video = channel.search(id)
 
         # Return video webpage
         if request.method == "GET":
             title = f"{video.title.current()} · {name}"
-            views_data = json.dumps(video.views._to_dict())
-            likes_data = json.dumps(video.likes._to_dict())
-            return render_template(
+            return _render(
                 "video.html",
                 title=title,
                 name=name,
+                kind=kind,
                 video=video,
-                views_data=views_data,
-                likes_data=likes_data,
+                chart_points=CHART_POINTS,
             )
 
         # Add new note
@@ -108,8 +219,10 @@ def video(name, kind, id):
             note = Note.new(video, timestamp, title, body)
 
             # Save new note
+            before = _stamp(Path(name))
             video.notes.append(note)
-            video.channel.commit()
+            video.channel.commit_note("add", note)
+            _cache().refresh(name, before)
 
             # Return
             return note._to_dict(), 200
@@ -132,7 +245,9 @@ def video(name, kind, id):
                 note.title = update["title"]
             if "body" in update:
                 note.body = update["body"]
-            video.channel.commit()
+            before = _stamp(Path(name))
+            video.channel.commit_note("update", note)
+            _cache().refresh(name, before)
 
             # Return
             return "Updated", 200
@@ -146,11 +261,17 @@ def video(name, kind, id):
 
             # Filter out note with id and save
             filtered_notes = []
+            deleted_notes = []
             for note in video.notes:
                 if note.id != delete["id"]:
                     filtered_notes.append(note)
+                else:
+                    deleted_notes.append(note)
+            before = _stamp(Path(name))
             video.notes = filtered_notes
-            video.channel.commit()
+            for note in deleted_notes:
+                video.channel.commit_note("delete", note)
+            _cache().refresh(name, before)
 
             # Return
             return "Deleted", 200
@@ -174,22 +295,234 @@ def video(name, kind, id):
         return redirect(url_for("routes.index", error=f"Internal server error:\n{e}"))
 
 
+@routes.route("/api/channel/<name>/<kind>/<id>/<element>")
+def video_chart(name, kind, id, element):
+    """Downsampled history of a video's views or likes as json, limited using the `points`, `start` and `end` args"""
+    if kind not in ["videos", "livestreams", "shorts"]:
+        return "Video kind not recognised", 404
+    if element not in ["views", "likes"]:
+        return "Only views and likes can be charted", 404
+
+    try:
+        # Get window and point budget
+        points = request.args.get("points", CHART_POINTS, type=int)
+        points = min(max(points, 2), MAX_CHART_POINTS)
+        start = request.args.get("start", type=datetime.fromisoformat)
+        end = request.args.get("end", type=datetime.fromisoformat)
+
+        # Downsample history
+        video = _load(name).search(id)
+        counter = getattr(video, element)
+        return {
+            "total": len(counter.inner),
+            "data": {
+                date.isoformat(): value
+                for date, value in counter.downsample(points, start, end)
+            },
+        }
+    except ArchiveNotFoundException:
+        return "Couldn't open channel's archive", 404
+    except VideoNotFoundException:
+        return "Couldn't find video in archive", 404
+
+
 @routes.route("/archive/<name>/video/<file>")
 def archive_video(name, file):
-    """Serves video file using it's filename (id + ext)"""
-    return send_from_directory(os.getcwd(), f"{name}/videos/{file}")
+    """Serves video file using it's filename (id + ext), supporting range requests for seeking and letting browsers reuse it for a while"""
+    resp = send_from_directory(
+        os.getcwd(), f"{name}/videos/{file}", max_age=VIDEO_MAX_AGE
+    )
+    resp.cache_control.public = True
+    return resp
 
 
 @routes.route("/archive/<name>/thumbnail/<id>")
 def archive_thumbnail(name, id):
-    """Serves thumbnail file using it's id"""
-    return send_from_directory(os.getcwd(), f"{name}/thumbnails/{id}.webp")
-
-
-def viewer() -> Flask:
-    """Generates viewer flask app, launch by just using the typical `app.run()`"""
+    """Serves thumbnail file using it's id, which is it's hash so it can be cached forever"""
+    resp = send_from_directory(
+        os.getcwd(),
+        f"{name}/thumbnails/{id}.webp",
+        conditional=True,
+        etag=id,
+        max_age=THUMBNAIL_MAX_AGE,
+    )
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
+
+
+class ChannelCache:
+    """Bounded least-recently-used cache of loaded channels, which reloads a channel once it's archive has changed on disk"""
+
+    size: int
+    channels: OrderedDict[str, tuple[tuple, Channel]]
+    indexes: WeakKeyDictionary[Channel, dict[str, dict[str, int]]]
+    lock: threading.Lock
+    metrics: ViewerMetrics
+
+    def __init__(self, size: int, metrics: Optional[ViewerMetrics] = None) -> None:
+        self.size = size
+        self.channels = OrderedDict()
+        self.indexes = WeakKeyDictionary()
+        self.lock = threading.Lock()
+        self.metrics = metrics if metrics is not None else ViewerMetrics()
+
+    def load(self, name: str) -> Channel:
+        """Gets channel from the cache if it's archive hasn't changed, otherwise loads it"""
+        # Get from cache if it's unchanged, stamping before loading so changes made whilst loading get noticed next time
+        stamp = _stamp(Path(name))
+        with self.lock:
+            cached = self.channels.get(name)
+            if cached is not None and cached[0] == stamp:
+                self.channels.move_to_end(name)
+                self.metrics.hit()
+                return cached[1]
+
+        # Load and cache, evicting the least recently used channel if it's full
+        start = time.perf_counter()
+        channel = Channel.load(name, lazy=True)
+        self.metrics.load(time.perf_counter() - start)
+        with self.lock:
+            self.channels[name] = (stamp, channel)
+            self.channels.move_to_end(name)
+            while len(self.channels) > self.size:
+                self.channels.popitem(last=False)
+
+        # Return
+        return channel
+
+    def positions(self, channel: Channel) -> dict[str, dict[str, int]]:
+        """Gets where each video of a cached channel is in it's kind's list, by kind and then id, working it out on first use"""
+        with self.lock:
+            positions = self.indexes.get(channel)
+        if positions is None:
+            positions = {
+                kind: {
+                    video.id: ind for ind, video in enumerate(getattr(channel, kind))
+                }
+                for kind in ["videos", "livestreams", "shorts"]
+            }
+            with self.lock:
+                self.indexes[channel] = positions
+        return positions
+
+    def refresh(self, name: str, before: tuple):
+        """Restamps a cached channel after the viewer's own commits to it as it already has them, or drops it if the archive had changed before them (`before`) so it's reloaded"""
+        with self.lock:
+            cached = self.channels.get(name)
+            if cached is None:
+                return
+            if cached[0] == before:
+                self.channels[name] = (_stamp(Path(name)), cached[1])
+            else:
+                del self.channels[name]
+
+
+def _page(channel: Channel, kind: str) -> tuple[list[Video], Optional[str]]:
+    """Gets page of videos for a kind using the `after` and `limit` request args, returning the cursor for the next page"""
+    # Get page size and where to start from
+    videos: list[Video] = getattr(channel, kind)
+    limit = request.args.get("limit", current_app.config["YARK_PAGE_SIZE"], type=int)
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    after = request.args.get("after")
+    start = 0
+    if after is not None:
+        position = _cache().positions(channel)[kind].get(after)
+        if position is None:
+            raise VideoNotFoundException(f"Couldn't find {after} in {kind}")
+        start = position + 1
+
+    # Cut out page with a cursor to the next one if there's more
+    page = videos[start : start + limit]
+    next = page[-1].id if start + limit < len(videos) else None
+    return page, next
+
+
+def _search(channel: Channel, query: str) -> list[Video]:
+    """Searches channel using the `limit` request arg, building it's search index first if it's never been built"""
+    limit = request.args.get("limit", SEARCH_RESULTS, type=int)
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    if not channel.search_index.built():
+        channel.search_index.rebuild(channel)
+    videos = []
+    for hit in channel.search_index.query(query, limit):
+        try:
+            videos.append(channel.search(hit.id))
+        except VideoNotFoundException:
+            continue
+    return videos
+
+
+def _kind(channel: Channel, video: Video) -> str:
+    """Gets which kind of video a video in the channel is, checking the usually smaller categories first"""
+    positions = _cache().positions(channel)
+    if video.id in positions["shorts"]:
+        return "shorts"
+    elif video.id in positions["livestreams"]:
+        return "livestreams"
+    return "videos"
+
+
+@routes.route("/metrics")
+def metrics():
+    """Request, cache and rendering statistics in the prometheus text format"""
+    return Response(
+        current_app.extensions["yark_metrics"].prometheus(),
+        mimetype="text/plain; version=0.0.4",
+    )
+
+
+def _render(template: str, **context) -> str:
+    """Renders template, recording how long it took"""
+    start = time.perf_counter()
+    rendered = render_template(template, **context)
+    current_app.extensions["yark_metrics"].render(template, time.perf_counter() - start)
+    return rendered
+
+
+def _cache() -> ChannelCache:
+    """Gets channel cache of the current viewer"""
+    return current_app.extensions["yark_cache"]
+
+
+def _load(name: str) -> Channel:
+    """Loads channel using the current viewer's cache"""
+    return _cache().load(name)
+
+
+def viewer(cache_size: int = 8, page_size: int = 60, x_sendfile: bool = False) -> Flask:
+    """
+    Generates viewer flask app which caches up to `cache_size` loaded channels and shows `page_size` videos at a time, launch by just using the typical `app.run()`
+
+    Media is streamed zero-copy when the server's `wsgi.file_wrapper` supports it, or `x_sendfile` can be set to hand files off to a fronting server like Apache
+    """
     # Make flask app
     app = Flask(__name__)
+    app.config["YARK_PAGE_SIZE"] = page_size
+    app.config["USE_X_SENDFILE"] = x_sendfile
+
+    # Cache of loaded channels and statistics for `/metrics`
+    metrics = ViewerMetrics()
+    app.extensions["yark_metrics"] = metrics
+    app.extensions["yark_cache"] = ChannelCache(cache_size, metrics)
+
+    # Time every request and count what it sent
+    @app.before_request
+    def _start_timer():
+        g.yark_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response: Response) -> Response:
+        if "yark_start" in g:
+            size = response.content_length
+            metrics.request(
+                request.endpoint or "unknown",
+                request.method,
+                response.status_code,
+                time.perf_counter() - g.yark_start,
+                size if size is not None else 0,
+            )
+        return response
 
     # Only log errors
     log = logging.getLogger("werkzeug")